@@ -6,6 +6,7 @@ import numpy as np
 #   intended to be easily adaptable for line-segment intersections
 #
 
+import functools
 import math
 
 
@@ -131,27 +132,238 @@ def _test_find_line_segment_intersection_2():
     print(result)
 
 
-def points_in_ploy(points_xy: list, poly_xy: list):
+def _segment_intersection_params(p0, p1, p2, p3):
+    """Array form of `find_line_segment_intersection_2`, inputs are broadcastable arrays of points in shape (..., 2).
 
-    poly_xy_list = list(poly_xy)
-    poly_xy_list.append(poly_xy_list[0])
+    :return: (valid, t, s), valid is True where segments p0-p1 and p2-p3 intersect (endpoints inclusive, collinear
+             excluded), the intersection is at p0 + t * (p1 - p0) = p2 + s * (p3 - p2).
+    """
+    s10_x, s10_y = p1[..., 0] - p0[..., 0], p1[..., 1] - p0[..., 1]
+    s32_x, s32_y = p3[..., 0] - p2[..., 0], p3[..., 1] - p2[..., 1]
+    s02_x, s02_y = p0[..., 0] - p2[..., 0], p0[..., 1] - p2[..., 1]
 
-    results = np.full((len(points_xy),), False, dtype=np.bool)
+    denom = s10_x * s32_y - s32_x * s10_y
+    s_numer = s10_x * s02_y - s10_y * s02_x
+    t_numer = s32_x * s02_y - s32_y * s02_x
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = t_numer / denom
+        s = s_numer / denom
+
+    valid = (denom != 0) & (t >= 0) & (t <= 1) & (s >= 0) & (s <= 1)
+
+    return valid, t, s
+
+
+def find_line_segment_intersection_batch(segments_a: np.ndarray, segments_b: np.ndarray):
+    """Batch version of `find_line_segment_intersection_2`, tests every segment in `segments_a` against every segment
+    in `segments_b`.
+
+    :param segments_a:  (N, 2, 2) array, [[[x0, y0], [x1, y1]], ...].
+    :param segments_b:  (M, 2, 2) array, [[[x0, y0], [x1, y1]], ...].
+    :return:            (mask, points), mask is a (N, M) boolean array, True where the segments intersect, and points is
+                        a (N, M, 2) array of intersection points, NaN where they do not.
+    """
+    segments_a = np.asarray(segments_a, dtype=np.float64).reshape((-1, 2, 2))
+    segments_b = np.asarray(segments_b, dtype=np.float64).reshape((-1, 2, 2))
+
+    p0, p1 = segments_a[:, np.newaxis, 0, :], segments_a[:, np.newaxis, 1, :]
+    p2, p3 = segments_b[np.newaxis, :, 0, :], segments_b[np.newaxis, :, 1, :]
+
+    mask, t, _ = _segment_intersection_params(p0, p1, p2, p3)
+
+    with np.errstate(invalid="ignore"):
+        points = p0 + t[..., np.newaxis] * (p1 - p0)
+    points[~mask] = np.nan
+
+    return mask, points
+
+
+def _test_find_line_segment_intersection_batch():
+    segments_a = [[(10, 10), (20, 20)], [(0, 0), (1, 0)]]
+    segments_b = [[(10, 20), (20, 10)], [(0, 5), (5, 5)], [(1, 0), (1, 1)], [(2, 0), (3, 0)]]
+
+    mask, points = find_line_segment_intersection_batch(segments_a, segments_b)
+
+    assert np.all(mask == [[True, False, False, False], [False, False, True, False]])
+    assert np.allclose(points[0, 0], find_line_segment_intersection_2(*segments_a[0], *segments_b[0]))
+    assert np.allclose(points[1, 2], [1, 0])
+    assert np.all(np.isnan(points[~mask]))
+
+    # against the scalar version
+    rng = np.random.RandomState(0)
+    segments_a, segments_b = rng.uniform(0, 10, (50, 2, 2)), rng.uniform(0, 10, (40, 2, 2))
+    mask, points = find_line_segment_intersection_batch(segments_a, segments_b)
+    for i, a in enumerate(segments_a):
+        for j, b in enumerate(segments_b):
+            res = find_line_segment_intersection_2(*a, *b)
+            assert mask[i, j] == (res is not None)
+            if res is not None:
+                assert np.allclose(points[i, j], res)
 
-    for i, point in enumerate(points_xy):
-        p1 = (-1e100, point[1])
-        p2 = (1e100, point[1])
 
-        count_intersection = 0
-        for j in range(len(poly_xy_list) - 1):
-            p3 = poly_xy_list[j]
-            p4 = poly_xy_list[j + 1]
+def _sweep_candidates(segments: np.ndarray) -> tuple:
+    """Sweep axis, sweep order and number of candidate pairs of each swept segment, see
+    `find_all_segment_intersections`.
 
-            if find_line_segment_intersection_2(p1, p2, p3, p4):
-                count_intersection += 1
+    Both axes are tried and the one with fewer overlapping pairs is kept, e.g. y for outlines dominated by long
+    horizontal edges, which overlap each other in x but rarely in y.
 
-        if count_intersection == 2:
-            results[i] = True
+    :param segments:    (N, 2, 2) array, [[[x0, y0], [x1, y1]], ...].
+    :return:            (axis, order, n_candidates), candidates of the segment at sweep position i are the
+                        n_candidates[i] segments following it in the sweep order.
+    """
+    lo, hi = np.min(segments, axis=1), np.max(segments, axis=1)
+
+    sweep = None
+    for axis in (0, 1):
+        order = np.argsort(lo[:, axis], kind="stable")
+        n_candidates = np.searchsorted(lo[order, axis], hi[order, axis], side="right") - np.arange(1, len(order) + 1)
+        n_candidates = np.maximum(n_candidates, 0)
+        if sweep is None or np.sum(n_candidates) < np.sum(sweep[2]):
+            sweep = (axis, order, n_candidates)
+
+    return sweep
+
+
+def find_all_segment_intersections(segments: np.ndarray, include_endpoints: bool = True, chunk_size: int = 2 ** 22):
+    """Finds all intersecting pairs among a set of segments.
+
+    A sweep (sweep and prune) along x or y, whichever has fewer overlapping pairs: segments are sorted by their lower
+    bound, only segments whose extents overlap the swept segment become candidates, candidates are pruned by extents
+    along the other axis and the survivors are tested in bulk. Cost is O(n log n + c), c being the number of overlapping
+    pairs along the sweep axis, rather than O(n^2).
+
+    :param segments:            (N, 2, 2) array, [[[x0, y0], [x1, y1]], ...].
+    :param include_endpoints:   False to drop intersections located at an endpoint of both segments, e.g. adjacent
+                                edges of a polygon.
+    :param chunk_size:          maximum number of candidate pairs tested at once.
+    :return:                    (pairs, points), pairs is a (K, 2) array of intersecting segment indexes with i < j and
+                                points is a (K, 2) array of intersection points.
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape((-1, 2, 2))
+
+    # sweep order, for each segment the candidates are all following segments starting before its upper bound
+    axis, order, n_candidates = _sweep_candidates(segments)
+    other_lo = np.min(segments[:, :, 1 - axis], axis=1)
+    other_hi = np.max(segments[:, :, 1 - axis], axis=1)
+
+    pairs, points = [np.zeros((0, 2), dtype=int)], [np.zeros((0, 2), dtype=np.float64)]
+
+    # walk the sweep in blocks of segments with bounded number of candidate pairs
+    i_block_start = 0
+    n_candidates_cumsum = np.cumsum(n_candidates)
+    while i_block_start < len(order):
+        n_offset = n_candidates_cumsum[i_block_start - 1] if i_block_start > 0 else 0
+        i_block_end = max(
+            i_block_start + 1,
+            int(np.searchsorted(n_candidates_cumsum, n_offset + chunk_size, side="right"))
+        )
+        n_ = n_candidates[i_block_start:i_block_end]
+
+        # expand candidate pairs in sweep positions
+        i_ = np.repeat(np.arange(i_block_start, i_block_end), n_)
+        j_ = i_ + 1 + np.arange(np.sum(n_)) - np.repeat(np.cumsum(n_) - n_, n_)
+        i_, j_ = order[i_], order[j_]
+
+        # prune by extents along the other axis
+        keep = (other_lo[i_] <= other_hi[j_]) & (other_lo[j_] <= other_hi[i_])
+        i_, j_ = i_[keep], j_[keep]
+
+        valid, t, s = _segment_intersection_params(
+            segments[i_, 0], segments[i_, 1], segments[j_, 0], segments[j_, 1]
+        )
+        if not include_endpoints:
+            valid &= ~(((t == 0) | (t == 1)) & ((s == 0) | (s == 1)))
+
+        i_, j_, t = i_[valid], j_[valid], t[valid]
+        pairs.append(np.sort(np.c_[i_, j_], axis=1))
+        points.append(segments[i_, 0] + t[:, np.newaxis] * (segments[i_, 1] - segments[i_, 0]))
+
+        i_block_start = i_block_end
+
+    pairs, points = np.concatenate(pairs), np.concatenate(points)
+
+    # consistent output order
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+
+    return pairs[order], points[order]
+
+
+def _test_find_all_segment_intersections():
+    rng = np.random.RandomState(0)
+    xy = rng.uniform(0, 100, (300, 2))
+    segments = np.stack([xy, xy + rng.uniform(-10, 10, (300, 2))], axis=1)
+
+    mask, _ = find_line_segment_intersection_batch(segments, segments)
+    pairs_expected = np.argwhere(np.triu(mask, k=1))
+
+    for chunk_size in [2 ** 22, 7]:
+        pairs, points = find_all_segment_intersections(segments, chunk_size=chunk_size)
+        assert np.all(pairs == pairs_expected)
+        for (i, j), p in zip(pairs, points):
+            assert np.allclose(p, find_line_segment_intersection_2(*segments[i], *segments[j]))
+
+    # closed polygon outline, adjacent edges only touch at their shared vertices
+    poly_xy = np.asarray([(0, 0), (10, 0), (10, 5), (6, 5), (10, 10), (4, 10), (0, 6)], dtype=np.float64)
+    segments = np.stack([poly_xy, np.roll(poly_xy, -1, axis=0)], axis=1)
+    pairs, _ = find_all_segment_intersections(segments)
+    assert len(pairs) == len(poly_xy)
+    pairs, _ = find_all_segment_intersections(segments, include_endpoints=False)
+    assert len(pairs) == 0
+
+    # self intersecting, bow tie
+    poly_xy = np.asarray([(0, 0), (10, 10), (10, 0), (0, 10)], dtype=np.float64)
+    segments = np.stack([poly_xy, np.roll(poly_xy, -1, axis=0)], axis=1)
+    pairs, points = find_all_segment_intersections(segments, include_endpoints=False)
+    assert np.all(pairs == [[0, 2]]) and np.allclose(points, [[5, 5]])
+
+    # facade like, many long horizontal edges crossed by a few vertical ones, candidates stay bounded
+    segments = np.concatenate([
+        [[(0, y), (100, y)] for y in np.arange(1000) * 0.1],
+        [[(x, -1), (x, 0.25)] for x in np.arange(10) * 10 + 5],
+    ]).astype(np.float64)
+    axis, _, n_candidates = _sweep_candidates(segments)
+    assert axis == 1 and np.sum(n_candidates) < 100
+    pairs, _ = find_all_segment_intersections(segments)
+    mask, _ = find_line_segment_intersection_batch(segments, segments)
+    assert np.all(pairs == np.argwhere(np.triu(mask, k=1)))
+
+
+def points_in_ploy(points_xy: list, poly_xy: list, chunk_size: int = 2 ** 22):
+    """Even-odd (crossing number) point in polygon test, all points are tested against all edges in array operations.
+    Works for concave polygons and rays crossing the boundary any number of times.
+
+    :param points_xy:   [[x0, y0], [x1, y1], ...], points to be tested.
+    :param poly_xy:     [[x0, y0], [x1, y1], ...], polygon vertices, the polygon closes itself.
+    :param chunk_size:  maximum number of point-edge pairs evaluated at once, edges are processed in chunks to bound
+                        memory.
+    :return:            boolean array, True if the point falls inside the polygon.
+    """
+
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape((-1, 2))
+    poly_xy = np.asarray(poly_xy, dtype=np.float64).reshape((-1, 2))
+
+    x, y = points_xy[:, 0:1], points_xy[:, 1:2]
+
+    # edges from vertex i to vertex i+1
+    x1, y1 = poly_xy[:, 0], poly_xy[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    results = np.full((len(points_xy),), False, dtype=bool)
+
+    step = max(1, int(chunk_size) // max(1, len(points_xy)))
+    for i in range(0, len(poly_xy), step):
+        x1_, y1_, x2_, y2_ = x1[i:i + step], y1[i:i + step], x2[i:i + step], y2[i:i + step]
+
+        # a horizontal ray to +x crosses the edge if the edge straddles the ray (half open so shared vertices count
+        # once and horizontal edges never count) and the crossing lies to the right of the point
+        straddle = (y1_ > y) != (y2_ > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1_ + (y - y1_) * (x2_ - x1_) / (y2_ - y1_)
+        crossing = straddle & (x < x_cross)
+
+        results ^= (np.count_nonzero(crossing, axis=1) % 2).astype(bool)
 
     return results
 
@@ -175,7 +387,283 @@ def _test_points_in_ploy():
 
     res = points_in_ploy(points_xy, poly_xy)
 
-    print(res)
+    assert np.all(res == [False, False, True, True, False, False])
+
+    # concave polygon, the ray through y=7 crosses the boundary 4 times
+    poly_xy = [(0, 0), (10, 0), (10, 5), (6, 5), (10, 10), (4, 10), (0, 6)]
+    points_xy = [(5, 7), (9, 7), (9.5, 9.5), (2, 9), (1, 1), (9, 4), (11, 7)]
+
+    res = points_in_ploy(points_xy, poly_xy)
+    assert np.all(res == [True, False, True, False, True, True, False])
+
+    # chunked edges agree with unchunked
+    points_xy = np.random.RandomState(0).uniform(-1, 11, (1000, 2))
+    assert np.all(points_in_ploy(points_xy, poly_xy) == points_in_ploy(points_xy, poly_xy, chunk_size=1))
+
+
+class PolygonIndex:
+    """Edge bucketed spatial index for repeated point in polygon tests against the same polygon.
+
+    Edges are bucketed into horizontal y-bands once at construction, a query point is then only tested against the
+    edges overlapping its band, rather than all edges. Inside/outside follows the same even-odd rule as
+    `points_in_ploy`.
+
+    :param poly_xy: [[x0, y0], [x1, y1], ...], polygon vertices, the polygon closes itself.
+    :param n_bands: number of y-bands, defaults to square root of the number of edges.
+    """
+
+    def __init__(self, poly_xy: list, n_bands: int = None):
+        poly_xy = np.asarray(poly_xy, dtype=np.float64).reshape((-1, 2))
+
+        # edges from vertex i to vertex i+1
+        self.x1, self.y1 = poly_xy[:, 0], poly_xy[:, 1]
+        self.x2, self.y2 = np.roll(self.x1, -1), np.roll(self.y1, -1)
+        n_edges = len(poly_xy)
+
+        if n_bands is None:
+            n_bands = int(np.ceil(n_edges ** 0.5))
+        self.n_bands = max(1, int(n_bands))
+
+        self.y_min, self.y_max = np.min(self.y1), np.max(self.y1)
+        self.band_height = (self.y_max - self.y_min) / self.n_bands
+        if self.band_height <= 0:
+            self.band_height = 1.
+
+        # each edge is registered in every band its y-range overlaps
+        band_lo = self._band(np.minimum(self.y1, self.y2))
+        band_hi = self._band(np.maximum(self.y1, self.y2))
+        counts = band_hi - band_lo + 1
+        edge_ids = np.repeat(np.arange(n_edges), counts)
+        band_ids = np.repeat(band_lo, counts) + np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # (n_bands, max edges per band) table of edge ids, padded with -1
+        order = np.argsort(band_ids, kind="stable")
+        edge_ids, band_ids = edge_ids[order], band_ids[order]
+        band_counts = np.bincount(band_ids, minlength=self.n_bands)
+        band_start = np.cumsum(band_counts) - band_counts
+        self.table = np.full((self.n_bands, max(1, np.max(band_counts))), -1, dtype=int)
+        self.table[band_ids, np.arange(len(band_ids)) - band_start[band_ids]] = edge_ids
+
+    def _band(self, y: np.ndarray) -> np.ndarray:
+        return np.clip(np.floor((y - self.y_min) / self.band_height).astype(int), 0, self.n_bands - 1)
+
+    def contains(self, points_xy: list, chunk_size: int = 2 ** 22) -> np.ndarray:
+        """Point in polygon test.
+
+        :param points_xy:   [[x0, y0], [x1, y1], ...], points to be tested.
+        :param chunk_size:  maximum number of point-edge pairs evaluated at once.
+        :return:            boolean array, True if the point falls inside the polygon.
+        """
+
+        points_xy = np.asarray(points_xy, dtype=np.float64).reshape((-1, 2))
+
+        results = np.full((len(points_xy),), False, dtype=bool)
+
+        # points out of the polygon y-range are outside without testing any edge
+        i_candidates = np.nonzero((points_xy[:, 1] >= self.y_min) & (points_xy[:, 1] <= self.y_max))[0]
+
+        step = max(1, int(chunk_size) // self.table.shape[1])
+        for i in range(0, len(i_candidates), step):
+            i_ = i_candidates[i:i + step]
+            x, y = points_xy[i_, 0:1], points_xy[i_, 1:2]
+
+            e = self.table[self._band(y[:, 0])]
+            valid = e >= 0
+            e = np.where(valid, e, 0)
+            x1, y1, x2, y2 = self.x1[e], self.y1[e], self.x2[e], self.y2[e]
+
+            straddle = valid & ((y1 > y) != (y2 > y))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            crossing = straddle & (x < x_cross)
+
+            results[i_] = (np.count_nonzero(crossing, axis=1) % 2).astype(bool)
+
+        return results
+
+
+def _test_polygon_index():
+    # star shaped polygon with many vertices
+    theta = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    r = 5 + 2 * np.sin(37 * theta)
+    poly_xy = np.c_[r * np.cos(theta), r * np.sin(theta)]
+
+    points_xy = np.random.RandomState(0).uniform(-8, 8, (5000, 2))
+
+    res_expected = points_in_ploy(points_xy, poly_xy)
+    assert np.all(PolygonIndex(poly_xy).contains(points_xy) == res_expected)
+    assert np.all(PolygonIndex(poly_xy, n_bands=1).contains(points_xy) == res_expected)
+    assert np.all(PolygonIndex(poly_xy, n_bands=500).contains(points_xy, chunk_size=1) == res_expected)
+
+    # degenerated, all vertices on the same y
+    assert not np.any(PolygonIndex([(0, 0), (1, 0), (2, 0)]).contains([(0.5, 0), (1, 1)]))
+
+
+def _triangulate_polygon(poly_xy: np.ndarray) -> np.ndarray:
+    n = len(poly_xy)
+    x, y = poly_xy[:, 0], poly_xy[:, 1]
+
+    # work on an anticlockwise vertex order
+    order = np.arange(n)
+    if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0:
+        order = order[::-1]
+    x, y = x[order], y[order]
+
+    def cross(i0, i1, i2):
+        return (x[i1] - x[i0]) * (y[i2] - y[i0]) - (y[i1] - y[i0]) * (x[i2] - x[i0])
+
+    # convex fast path, fan from the first vertex
+    prev_, next_ = (np.arange(n) - 1) % n, (np.arange(n) + 1) % n
+    if np.all(cross(prev_, np.arange(n), next_) >= 0):
+        return order[np.c_[np.zeros((n - 2,), dtype=int), np.arange(1, n - 1), np.arange(2, n)]]
+
+    # ear clipping on a doubly linked list of remaining vertices
+    alive = np.full((n,), True)
+    triangles = list()
+    i1, n_remaining, n_failed = 0, n, 0
+    while n_remaining > 3:
+        i0, i2 = prev_[i1], next_[i1]
+        c = cross(i0, i1, i2)
+
+        is_ear = c > 0
+        if is_ear:
+            # no other remaining reflex vertex inside or on the candidate ear
+            j = np.nonzero(alive)[0]
+            j = j[(j != i0) & (j != i1) & (j != i2)]
+            j = j[cross(prev_[j], j, next_[j]) <= 0]
+            is_ear = not np.any((cross(i0, i1, j) >= 0) & (cross(i1, i2, j) >= 0) & (cross(i2, i0, j) >= 0))
+
+        if is_ear or c == 0:
+            # clip the ear, collinear vertices are dropped without a triangle
+            if is_ear:
+                triangles.append((i0, i1, i2))
+            next_[i0], prev_[i2] = i2, i0
+            alive[i1] = False
+            n_remaining -= 1
+            i1, n_failed = i0, 0
+        else:
+            i1 = i2
+            n_failed += 1
+            if n_failed > n_remaining:
+                raise ValueError('Unable to triangulate polygon, it may be self intersecting.')
+
+    i0, i2 = prev_[i1], next_[i1]
+    if cross(i0, i1, i2) != 0:
+        triangles.append((i0, i1, i2))
+
+    return order[np.asarray(triangles, dtype=int).reshape((-1, 3))]
+
+
+@functools.lru_cache(maxsize=256)
+def _triangulate_polygon_cached(poly_xy_bytes: bytes, n: int) -> np.ndarray:
+    triangles = _triangulate_polygon(np.frombuffer(poly_xy_bytes, dtype=np.float64).reshape((n, 2)))
+    triangles.flags.writeable = False
+    return triangles
+
+
+def triangulate_polygon(poly_xy: list) -> np.ndarray:
+    """Triangulates a simple polygon by ear clipping, convex polygons take a fan from the first vertex directly.
+    Results are cached per polygon.
+
+    :param poly_xy: [[x0, y0], [x1, y1], ...], polygon vertices, the polygon closes itself.
+    :return:        (n, 3) array of vertex indexes, each row is a triangle in the polygon's winding order.
+    """
+    poly_xy = np.ascontiguousarray(poly_xy, dtype=np.float64).reshape((-1, 2))
+    return _triangulate_polygon_cached(poly_xy.tobytes(), len(poly_xy))
+
+
+def _test_triangulate_polygon():
+    def area(xy):
+        return 0.5 * abs(np.dot(xy[:, 0], np.roll(xy[:, 1], -1)) - np.dot(xy[:, 1], np.roll(xy[:, 0], -1)))
+
+    polygons = [
+        [(0, 0), (10, 0), (10, 5), (0, 5)],  # convex
+        [(0, 0), (10, 0), (10, 5), (6, 5), (10, 10), (4, 10), (0, 6)],  # concave
+        [(0, 6), (4, 10), (10, 10), (6, 5), (10, 5), (10, 0), (0, 0)],  # concave, clockwise
+        [(0, 0), (10, 0), (10, 2), (2, 2), (2, 8), (10, 8), (10, 10), (0, 10)],  # C shaped
+        [(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)],  # collinear vertices
+    ]
+
+    # star shaped polygon with many reflex vertices
+    theta = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    r = 5 + 2 * np.sin(17 * theta)
+    polygons.append(np.c_[r * np.cos(theta), r * np.sin(theta)])
+
+    for poly_xy in polygons:
+        poly_xy = np.asarray(poly_xy, dtype=np.float64)
+        triangles = triangulate_polygon(poly_xy)
+
+        # triangles cover the polygon without overlapping, and their centroids lie inside
+        assert np.allclose(np.sum([area(poly_xy[t]) for t in triangles]), area(poly_xy))
+        assert np.all(points_in_ploy(np.average(poly_xy[triangles], axis=1), poly_xy))
+
+    # cached
+    assert triangulate_polygon(polygons[1]) is triangulate_polygon(polygons[1])
+
+
+def polygon_frame_3d(polygons: list):
+    """Newell normals, true areas and local 2D frames of many planar 3D polygons at once.
+
+    A point xyz on polygon i maps to its local 2D coordinates by `(xyz - origins[i]) @ axes[i, 0:2].T` and back by
+    `origins[i] + xy @ axes[i, 0:2]`.
+
+    :param polygons:    a list of polygons, each in [[x1, y1, z1], [x2, y2, z2], ...], vertex counts may differ.
+    :return:            (normals, areas, origins, axes), normals is (P, 3) unit Newell normals following the vertices
+                        winding (right hand rule), areas is (P,), origins is (P, 3), the first vertex of each polygon,
+                        and axes is (P, 3, 3), each [e1, e2, normal] orthonormal basis of the polygon plane.
+    """
+    polygons = [np.asarray(p, dtype=np.float64).reshape((-1, 3)) for p in polygons]
+    n_vertices = np.asarray([len(p) for p in polygons], dtype=int)
+
+    xyz = np.concatenate(polygons)
+    i_start = np.cumsum(n_vertices) - n_vertices
+    i_polygon = np.repeat(np.arange(len(polygons)), n_vertices)
+
+    # vertices relative to the first vertex of their polygon
+    origins = xyz[i_start]
+    xyz = xyz - origins[i_polygon]
+
+    # Newell normal, sum of cross products of consecutive vertices, its magnitude is twice of the area
+    i_next = np.arange(len(xyz)) + 1
+    i_next[i_start + n_vertices - 1] = i_start
+    newell = np.add.reduceat(np.cross(xyz, xyz[i_next]), i_start, axis=0)
+    areas = np.linalg.norm(newell, axis=1) / 2
+    normals = newell / (2 * areas)[:, np.newaxis]
+
+    # first in-plane axis along the longest edge, so rectangles stay axis aligned in their local frames, second axis
+    # completes the right hand basis
+    edges = xyz[i_next] - xyz
+    d = np.einsum("ij,ij->i", edges, edges)
+    e1 = edges[np.lexsort((-d, i_polygon))[i_start]]
+    e1 = e1 - np.einsum("ij,ij->i", e1, normals)[:, np.newaxis] * normals
+    e1 /= np.linalg.norm(e1, axis=1)[:, np.newaxis]
+    e2 = np.cross(normals, e1)
+
+    axes = np.stack([e1, e2, normals], axis=1)
+
+    return normals, areas, origins, axes
+
+
+def _test_polygon_frame_3d():
+    polygons = [
+        [(0, 0, 2), (10, 0, 2), (10, 5, 2), (0, 5, 2)],  # horizontal
+        [(0, 0, 0), (0, 4, 0), (0, 4, 3), (0, 0, 3)],  # vertical, facing +x
+        [(0, 0, 0), (10, 0, 0), (10, 5, 5), (0, 5, 5)],  # tilted at 45 degrees
+        [(0, 0, 0), (10, 0, 0), (10, 5, 0), (6, 5, 0), (10, 10, 0), (4, 10, 0), (0, 6, 0)],  # concave
+    ]
+
+    normals, areas, origins, axes = polygon_frame_3d(polygons)
+
+    assert np.allclose(areas, [50, 12, 50 * 2 ** 0.5, 82])
+    assert np.allclose(normals[0:2], [[0, 0, 1], [1, 0, 0]])
+    assert np.allclose(normals[2], [0, -2 ** -0.5, 2 ** -0.5])
+
+    for p, o, a in zip(polygons, origins, axes):
+        # orthonormal bases
+        assert np.allclose(a @ a.T, np.eye(3))
+        # round trip through local 2D coordinates, points stay on the plane
+        xy = (np.asarray(p) - o) @ a[0:2].T
+        assert np.allclose(o + xy @ a[0:2], p)
 
 
 def ray_tracing_numpy(x, y, poly):
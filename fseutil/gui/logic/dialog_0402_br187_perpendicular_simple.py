@@ -2,7 +2,8 @@ from PySide2 import QtWidgets, QtGui, QtCore
 
 from fseutil.etc.images_base64 import dialog_0402_br187_perpendicular_figure_1 as figure_1
 from fseutil.gui.layout.dialog_0401_br187_parallel_simple import Ui_MainWindow
-from fseutil.lib.fse_thermal_radiation import phi_perpendicular_any_br187, linear_solver
+from fseutil.lib.fse_thermal_radiation import phi_perpendicular_any_br187, dphi_dS_perpendicular_any_br187
+from fseutil.lib.fse_thermal_radiation import newton_solver
 
 
 class Dialog0402(QtWidgets.QMainWindow):
@@ -153,8 +154,9 @@ class Dialog0402(QtWidgets.QMainWindow):
             phi_target = q_target / (Q * UA)
 
             try:
-                S_solved = linear_solver(
+                S_solved = newton_solver(
                     func=phi_perpendicular_any_br187,
+                    func_prime=dphi_dS_perpendicular_any_br187,
                     dict_params=dict(W_m=W, H_m=H, w_m=0., h_m=0., S_m=0),
                     x_name='S_m',
                     y_target=phi_target,
@@ -2,7 +2,7 @@ from PySide2 import QtWidgets, QtGui, QtCore
 
 from fseutil.etc.images_base64 import dialog_0403_br187_parallel_figure_1 as figure_1
 from fseutil.gui.layout.dialog_0403_br187_parallel_complex import Ui_MainWindow
-from fseutil.lib.fse_thermal_radiation import phi_parallel_any_br187, linear_solver
+from fseutil.lib.fse_thermal_radiation import phi_parallel_any_br187, dphi_dS_parallel_any_br187, newton_solver
 
 
 class Dialog0403(QtWidgets.QMainWindow):
@@ -157,8 +157,9 @@ class Dialog0403(QtWidgets.QMainWindow):
             phi_target = q_target / (Q * UA)
 
             try:
-                S_solved = linear_solver(
+                S_solved = newton_solver(
                     func=phi_parallel_any_br187,
+                    func_prime=dphi_dS_parallel_any_br187,
                     dict_params=dict(W_m=W, H_m=H, w_m=0.5*W+w, h_m=0.5*H+h, S_m=0),
                     x_name='S_m',
                     y_target=phi_target,
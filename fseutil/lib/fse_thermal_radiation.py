@@ -4,8 +4,14 @@ import math
 from statistics import median
 from typing import Callable
 
+import numpy as np
+
+from fseutil.libstd.bre_br_187_2014 import eq_A4_dphi_dS_parallel_corner
 from fseutil.libstd.bre_br_187_2014 import eq_A4_phi_parallel_corner
+from fseutil.libstd.bre_br_187_2014 import eq_A4_phi_parallel_corner_array
+from fseutil.libstd.bre_br_187_2014 import eq_A5_dphi_dS_perpendicular_corner
 from fseutil.libstd.bre_br_187_2014 import eq_A5_phi_perpendicular_corner
+from fseutil.libstd.bre_br_187_2014 import eq_A5_phi_perpendicular_corner_array
 
 
 def linear_solver(
@@ -74,6 +80,287 @@ def linear_solver(
     return None  # this shouldn't be possible, should always terminate within the while loop above
 
 
+def linear_solver_batch(
+        func: Callable,
+        dict_params: dict,
+        x_name: str,
+        y_target,
+        x_upper,
+        x_lower,
+        y_tol: float,
+        iter_max: int = 1000,
+        func_multiplier: float = 1
+):
+    """Batch version of `linear_solver`, solves many cases at once by bisection with the same steps as `linear_solver`.
+
+    `func` is called with arrays, e.g. `phi_parallel_any_br187_array`. `y_target`, `x_upper`, `x_lower` and values in
+    `dict_params` can be arrays and are broadcast together, each element is a case. All unsolved cases are evaluated
+    in one `func` call per iteration, solved cases are masked out.
+
+    :param func:            The function to be solved, taking and returning arrays.
+    :param dict_params:     Additional parameters of the function, scalars or arrays.
+    :param x_name:          The variable (name) to be solved for.
+    :param y_target:        The target to be solved for, i.e. solve for `f(x)==y_target`.
+    :param x_upper:         The upper limit of the variable.
+    :param x_lower:         The lower limit of the variable.
+    :param y_tol:           Solver tolerance, i.e. actually solve for `abs(f(x)-y_target)<y_tal`.
+    :param iter_max:        Maximum iteration of the solver.
+    :param func_multiplier: 1 if f(x) is proportional to x, -1 if f(x) is inversely proportional to x.
+    :return:                (x_solved, status), arrays in the broadcast shape. Status is 0 when solved within `y_tol`,
+                            1 or 2 when the target is out of range and the lower or upper limit is returned (as
+                            `linear_solver` does), and -1 when `iter_max` is reached, x_solved is then the last
+                            estimate rather than None.
+    """
+    names = [k for k in dict_params if k != x_name]
+    arrays = np.broadcast_arrays(
+        *[np.asarray(i, dtype=np.float64) for i in [y_target, x_upper, x_lower] + [dict_params[k] for k in names]]
+    )
+    shape = arrays[0].shape
+    y_target, x_upper, x_lower, *params = [np.ravel(i) for i in arrays]
+
+    x_lower, x_upper = np.minimum(x_lower, x_upper), np.maximum(x_lower, x_upper)
+    y_target = y_target * func_multiplier
+
+    def f(x_: np.ndarray, i_: np.ndarray) -> np.ndarray:
+        kwargs = {k: v[i_] for k, v in zip(names, params)}
+        kwargs[x_name] = x_
+        return func_multiplier * np.asarray(func(**kwargs), dtype=np.float64)
+
+    n = len(y_target)
+    cases = np.arange(n)
+    x1, x3 = x_lower.copy(), x_upper.copy()
+    x2 = (x1 + x3) / 2
+    y1, y2, y3 = f(x1, cases), f(x2, cases), f(x3, cases)
+
+    x_solved = x2.copy()
+    status = np.full((n,), -1, dtype=int)
+
+    # target out of range
+    lower = y_target < y1
+    upper = ~lower & (y_target > y3)
+    x_solved[lower], status[lower] = x1[lower], 1
+    x_solved[upper], status[upper] = x3[upper], 2
+
+    active = cases[~lower & ~upper]
+    iter_count = 0
+    while len(active) > 0:
+        solved = np.abs(y2[active] - y_target[active]) < y_tol
+        x_solved[active[solved]], status[active[solved]] = x2[active[solved]], 0
+        active = active[~solved]
+        if iter_max < iter_count:
+            x_solved[active] = x2[active]
+            break
+
+        below = y2[active] < y_target[active]
+        x1[active[below]] = x2[active[below]]
+        x3[active[~below]] = x2[active[~below]]
+        x2[active] = (x1[active] + x3[active]) / 2
+        y2[active] = f(x2[active], active)
+        iter_count += 1
+
+    return x_solved.reshape(shape), status.reshape(shape)
+
+
+def _test_linear_solver_batch():
+    # separation distances for many openings, against solving them one by one
+    rng = np.random.RandomState(0)
+    W, H = rng.uniform(1, 20, (2, 500))
+    phi_target = rng.uniform(0.01, 0.5, 500)
+
+    kwargs = dict(x_name='S_m', x_upper=1000, x_lower=0.01, y_tol=0.001, iter_max=500, func_multiplier=-1)
+    S, status = linear_solver_batch(
+        func=phi_parallel_any_br187_array, dict_params=dict(W_m=W, H_m=H, w_m=0.5 * W, h_m=0.5 * H, S_m=0),
+        y_target=phi_target, **kwargs
+    )
+    assert S.shape == status.shape == (500,)
+    assert np.all(status >= 0)
+
+    for i in range(len(W)):
+        S_ = linear_solver(
+            func=phi_parallel_any_br187, dict_params=dict(W_m=W[i], H_m=H[i], w_m=0.5 * W[i], h_m=0.5 * H[i], S_m=0),
+            y_target=phi_target[i], **kwargs
+        )
+        assert abs(S[i] - S_) < 1e-6 * S_
+        if status[i] == 0:
+            assert abs(phi_parallel_any_br187(W[i], H[i], 0.5 * W[i], 0.5 * H[i], S[i]) - phi_target[i]) < 0.001
+
+    # out of range targets, and maximum iteration reached
+    S, status = linear_solver_batch(
+        func=phi_parallel_any_br187_array, dict_params=dict(W_m=10, H_m=10, w_m=5, h_m=5),
+        x_name='S_m', y_target=[1.1, 1e-9, 0.1], x_upper=1000, x_lower=0.01, y_tol=1e-3, func_multiplier=-1,
+    )
+    assert np.all(status == [1, 2, 0]) and S[0] == 0.01 and S[1] == 1000
+
+    S, status = linear_solver_batch(
+        func=phi_parallel_any_br187_array, dict_params=dict(W_m=10, H_m=10, w_m=5, h_m=5),
+        x_name='S_m', y_target=0.1, x_upper=1000, x_lower=0.01, y_tol=1e-12, iter_max=2, func_multiplier=-1,
+    )
+    assert status == -1 and linear_solver(
+        func=phi_parallel_any_br187, dict_params=dict(W_m=10, H_m=10, w_m=5, h_m=5, S_m=0),
+        x_name='S_m', y_target=0.1, x_upper=1000, x_lower=0.01, y_tol=1e-12, iter_max=2, func_multiplier=-1,
+    ) is None
+
+
+def newton_solver(
+        func: Callable,
+        func_prime: Callable,
+        dict_params: dict,
+        x_name: str,
+        y_target: float,
+        x_upper: float,
+        x_lower: float,
+        y_tol: float,
+        iter_max: int = 100,
+        func_multiplier: float = 1
+):
+    """Safeguarded Newton solver, a drop-in for `linear_solver` when the derivative of `func` is available.
+
+    For positive functions of positive x, e.g. view factor against separation distance. Newton steps are taken on
+    log(y) against log(x), where view factors are close to linear in far field, starting from the log-log secant of
+    the limits. The root is kept bracketed and a bisection (in log(x)) is taken when a Newton step falls outside the
+    bracket or does not halve the residual quick enough, so it never does worse than `linear_solver`.
+
+    :param func:            The function to be solved.
+    :param func_prime:      Derivative of `func` with respect to `x_name`, takes the same parameters as `func`.
+    :param dict_params:     Additional parameters of the function.
+    :param x_name:          The variable (name) to be solved for.
+    :param y_target:        The target to be solved for, i.e. solve for `f(x)==y_target`. Not greater than 0, or with
+                            `x_lower` not greater than 0, the case is passed to `linear_solver`.
+    :param x_upper:         The upper limit of the variable.
+    :param x_lower:         The lower limit of the variable.
+    :param y_tol:           Solver tolerance, i.e. actually solve for `abs(f(x)-y_target)<y_tal`.
+    :param iter_max:        Maximum iteration of the solver.
+    :param func_multiplier: 1 if f(x) is proportional to x, -1 if f(x) is inversely proportional to x.
+    :return:                Same as `linear_solver`, the solved x, the limit if the target is out of range or None
+                            if `iter_max` is reached.
+    """
+    if x_lower > x_upper:
+        x_lower, x_upper = x_upper, x_lower
+
+    # outside the log-log domain, same results as `linear_solver`
+    if x_lower <= 0 or y_target <= 0:
+        return linear_solver(
+            func=func, dict_params=dict_params, x_name=x_name, y_target=y_target, x_upper=x_upper, x_lower=x_lower,
+            y_tol=y_tol, iter_max=iter_max, func_multiplier=func_multiplier
+        )
+
+    def f(x_):
+        dict_params[x_name] = x_
+        return func(**dict_params)
+
+    def f_prime(x_):
+        dict_params[x_name] = x_
+        return func_prime(**dict_params)
+
+    y1, y3 = f(x_lower), f(x_upper)
+
+    # target out of range, same as `linear_solver`
+    if func_multiplier * y_target < func_multiplier * y1:
+        return x_lower
+    elif func_multiplier * y_target > func_multiplier * y3:
+        return x_upper
+
+    # h(u) = +/- (log(y) - log(y_target)) with u = log(x), increasing with u
+    def h(y_):
+        return func_multiplier * (math.log(max(y_, 1e-300)) - math.log(y_target))
+
+    u1, u3 = math.log(x_lower), math.log(x_upper)
+    h1, h3 = h(y1), h(y3)
+    u = u1 - h1 * (u3 - u1) / (h3 - h1) if h3 > h1 else 0.5 * (u1 + u3)
+    du_old = u3 - u1
+
+    iter_count = 0
+    while iter_count <= iter_max:
+        x = math.exp(u)
+        y = f(x)
+        if abs(y - y_target) < y_tol:
+            return x
+
+        h2 = h(y)
+        if h2 < 0:
+            u1 = u
+        else:
+            u3 = u
+        if u3 - u1 <= 4 * 2.2e-16 * max(abs(u1), abs(u3), 1):
+            return x  # bracket cannot be narrowed further
+
+        dh = func_multiplier * x * f_prime(x) / max(y, 1e-300)
+        if dh > 0 and u1 < u - h2 / dh < u3 and abs(2 * h2) < abs(du_old * dh):
+            du_old = h2 / dh
+            u = u - du_old
+        else:
+            du_old = 0.5 * (u3 - u1)
+            u = 0.5 * (u1 + u3)
+
+        iter_count += 1
+
+    return None
+
+
+def _test_newton_solver():
+    rng = np.random.RandomState(0)
+    W, H = rng.uniform(1, 50, (2, 200))
+    phi_target = rng.uniform(0.01, 0.5, 200)
+
+    # count function evaluations
+    n_evaluations = [0]
+
+    def func(*args, **kwargs):
+        n_evaluations[0] += 1
+        return phi_parallel_any_br187(*args, **kwargs)
+
+    kwargs = dict(x_name='S_m', x_upper=1000, x_lower=0.01, iter_max=500, func_multiplier=-1)
+    for W_, H_, phi_target_ in zip(W, H, phi_target):
+        dict_params = dict(W_m=W_, H_m=H_, w_m=0.5 * W_, h_m=0.5 * H_, S_m=0)
+
+        n_evaluations[0] = 0
+        S = newton_solver(
+            func=func, func_prime=dphi_dS_parallel_any_br187, dict_params=dict_params, y_target=phi_target_,
+            y_tol=0.001, **kwargs
+        )
+        S_ = linear_solver(
+            func=phi_parallel_any_br187, dict_params=dict_params, y_target=phi_target_, y_tol=0.001, **kwargs
+        )
+        if S_ in (0.01, 1000):
+            assert S == S_
+        else:
+            assert abs(phi_parallel_any_br187(W_, H_, 0.5 * W_, 0.5 * H_, S) - phi_target_) < 0.001
+            assert n_evaluations[0] <= 8  # 2 for the limits, against typically 10 to 20 by `linear_solver`
+
+        # tight tolerance
+        n_evaluations[0] = 0
+        S = newton_solver(
+            func=func, func_prime=dphi_dS_parallel_any_br187, dict_params=dict_params, y_target=phi_target_,
+            y_tol=1e-12, **kwargs
+        )
+        if S not in (0.01, 1000):
+            assert abs(phi_parallel_any_br187(W_, H_, 0.5 * W_, 0.5 * H_, S) - phi_target_) < 1e-12
+            assert n_evaluations[0] <= 12
+
+    # perpendicular, receiver off centre
+    S = newton_solver(
+        func=phi_perpendicular_any_br187, func_prime=dphi_dS_perpendicular_any_br187,
+        dict_params=dict(W_m=10, H_m=5, w_m=2, h_m=1, S_m=0), y_target=0.05, y_tol=1e-9, **kwargs
+    )
+    assert abs(phi_perpendicular_any_br187(10, 5, 2, 1, S) - 0.05) < 1e-9
+
+    # out of range and maximum iteration reached, same as `linear_solver`
+    dict_params = dict(W_m=10, H_m=10, w_m=5, h_m=5, S_m=0)
+    kwargs.update(func=phi_parallel_any_br187, func_prime=dphi_dS_parallel_any_br187, dict_params=dict_params)
+    assert newton_solver(y_target=1.1, y_tol=0.001, **kwargs) == 0.01
+    assert newton_solver(y_target=1e-9, y_tol=0.001, **kwargs) == 1000
+
+    # non-positive target, same as `linear_solver`
+    for y_target in [0, -1]:
+        assert newton_solver(y_target=y_target, y_tol=0.001, **kwargs) == 1000
+        assert linear_solver(
+            func=phi_parallel_any_br187, dict_params=dict_params, x_name='S_m', y_target=y_target, x_upper=1000,
+            x_lower=0.01, y_tol=0.001, iter_max=500, func_multiplier=-1,
+        ) == 1000
+    kwargs.update(iter_max=0)
+    assert newton_solver(y_target=0.01, y_tol=1e-15, **kwargs) is None
+
+
 def phi_parallel_any_br187(W_m, H_m, w_m, h_m, S_m):
     r"""
     :param W_m:
@@ -96,6 +383,22 @@ def phi_perpendicular_any_br187(W_m, H_m, w_m, h_m, S_m):
     return sum(phi)
 
 
+def dphi_dS_parallel_any_br187(W_m, H_m, w_m, h_m, S_m):
+    """Derivative of `phi_parallel_any_br187` with respect to S_m, see `newton_solver`."""
+    dphi_dS = [
+        eq_A4_dphi_dS_parallel_corner(*P[0:-1], S_m, P[-1])
+        for P in four_planes(W_m, H_m, w_m, h_m)
+    ]
+    return sum(dphi_dS)
+
+
+def dphi_dS_perpendicular_any_br187(W_m, H_m, w_m, h_m, S_m):
+    """Derivative of `phi_perpendicular_any_br187` with respect to S_m, see `newton_solver`."""
+    four_P = four_planes(W_m, H_m, w_m, h_m)
+    dphi_dS = [eq_A5_dphi_dS_perpendicular_corner(*P[0:-1], S_m, P[-1]) for P in four_P]
+    return sum(dphi_dS)
+
+
 def four_planes(W_m: float, H_m: float, w_m: float, h_m: float) -> tuple:
     """
     :param W_m:
@@ -217,6 +520,238 @@ def four_planes(W_m: float, H_m: float, w_m: float, h_m: float) -> tuple:
     return A, B, C, D
 
 
+def phi_parallel_any_br187_array(W_m, H_m, w_m, h_m, S_m):
+    """Same as `phi_parallel_any_br187`, but all parameters can be arrays and are broadcast together, e.g. a phi map
+    over a facade grid of receiver positions (w_m, h_m) from one call.
+
+    :return: view factor, NaN where receiver position is not classified by `four_planes_array`.
+    """
+    P = four_planes_array(W_m, H_m, w_m, h_m)
+    S_m = np.asarray(S_m, dtype=np.float64)[..., np.newaxis]
+    return np.sum(eq_A4_phi_parallel_corner_array(P[..., 0], P[..., 1], S_m, P[..., 2]), axis=-1)
+
+
+def phi_perpendicular_any_br187_array(W_m, H_m, w_m, h_m, S_m):
+    """Same as `phi_perpendicular_any_br187`, but all parameters can be arrays and are broadcast together, see
+    `phi_parallel_any_br187_array`.
+    """
+    P = four_planes_array(W_m, H_m, w_m, h_m)
+    S_m = np.asarray(S_m, dtype=np.float64)[..., np.newaxis]
+    return np.sum(eq_A5_phi_perpendicular_corner_array(P[..., 0], P[..., 1], S_m, P[..., 2]), axis=-1)
+
+
+def phi_map_br187(
+        W_m: float,
+        H_m: float,
+        S_m: float,
+        Q_kW: float = 84.,
+        n_w: int = 101,
+        n_h: int = 101,
+        w_range: tuple = None,
+        h_range: tuple = None,
+        orientation: str = 'parallel',
+        chunk_size: int = 2 ** 18,
+):
+    """View factor and incident heat flux fields over a grid of receiver positions, opposite a rectangle emitter.
+
+    The whole grid is evaluated by `phi_parallel_any_br187_array` or `phi_perpendicular_any_br187_array`, in blocks of
+    `chunk_size` receivers, so grids of 1000 x 1000 and above are bounded in memory.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param S_m: in m, separation distance from surface to surface
+    :param Q_kW: in kW/m2, emitter heat flux
+    :param n_w: number of receiver positions along width
+    :param n_h: number of receiver positions along height
+    :param w_range: in m, (min, max) receiver horizontal positions, measured from the emitter corner, default (0, W_m)
+    :param h_range: in m, (min, max) receiver vertical positions, measured from the emitter corner, default (0, H_m)
+    :param orientation: 'parallel' or 'perpendicular', see `phi_parallel_any_br187` and `phi_perpendicular_any_br187`
+    :param chunk_size: maximum number of receiver positions evaluated at once
+    :return: (w, h, phi, q, (w_max, h_max, q_max)), receiver positions w (n_w,) and h (n_h,), view factor and
+        incident heat flux in kW/m2 in shape (n_h, n_w), and where the incident heat flux peaks.
+    """
+    phi_func = {
+        'parallel': phi_parallel_any_br187_array,
+        'perpendicular': phi_perpendicular_any_br187_array,
+    }.get(orientation)
+    if phi_func is None:
+        raise ValueError(f'Unknown orientation {orientation}.')
+
+    w = np.linspace(*(w_range or (0, W_m)), n_w)
+    h = np.linspace(*(h_range or (0, H_m)), n_h)
+
+    phi = np.empty((n_h * n_w,), dtype=np.float64)
+    for i in range(0, n_h * n_w, chunk_size):
+        i_ = np.arange(i, min(i + chunk_size, n_h * n_w))
+        phi[i_] = phi_func(W_m, H_m, w[i_ % n_w], h[i_ // n_w], S_m)
+    phi = phi.reshape((n_h, n_w))
+
+    q = Q_kW * phi
+    i_max = np.unravel_index(np.nanargmax(q), q.shape)
+
+    return w, h, phi, q, (w[i_max[1]], h[i_max[0]], q[i_max])
+
+
+def _test_phi_map_br187():
+    # parallel, peaks at the centre
+    w, h, phi, q, (w_max, h_max, q_max) = phi_map_br187(10, 10, 10, Q_kW=84., n_w=41, n_h=21)
+    assert phi.shape == q.shape == (21, 41) and w.shape == (41,) and h.shape == (21,)
+    assert (w_max, h_max) == (5, 5)
+    assert abs(q_max / 84. - 0.2394564705) < 1e-8
+    assert np.allclose(q, 84. * phi)
+    assert abs(phi[0, 0] - 0.1385316060) < 1e-8  # corner
+    assert abs(phi[0, 8] - 0.1638694545) < 1e-8  # edge, w = 2
+
+    # against scalar evaluation, receiver positions outside of the emitter too, perpendicular
+    w, h, phi, q, _ = phi_map_br187(
+        10, 10, 10, n_w=7, n_h=5, w_range=(-5, 15), h_range=(-10, 20), orientation='perpendicular'
+    )
+    for i, j in np.ndindex(phi.shape):
+        assert abs(phi[i, j] - phi_perpendicular_any_br187(10, 10, w[j], h[i], 10)) < 1e-12
+
+    # large grid, in blocks
+    w, h, phi, q, (w_max, h_max, q_max) = phi_map_br187(20, 5, 6, n_w=1000, n_h=1000, chunk_size=100000)
+    assert phi.shape == (1000, 1000) and not np.any(np.isnan(phi))
+    assert q_max == np.max(q)
+
+    try:
+        phi_map_br187(10, 10, 10, orientation='oblique')
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def four_planes_array(W_m, H_m, w_m, h_m) -> np.ndarray:
+    """Same as `four_planes`, but all parameters can be arrays and are broadcast together. All receiver positions are
+    classified at once with masks, in the same order of precedence as `four_planes`.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param w_m: in m, receiver horizontal position, measured from the emitter corner
+    :param h_m: in m, receiver vertical position, measured from the emitter corner
+    :return: planes A, B, C and D as [width, height, multiplier] in shape (..., 4, 3), NaN where unknown.
+    """
+    W_m, H_m, w_m, h_m = np.broadcast_arrays(*[np.asarray(i, dtype=np.float64) for i in (W_m, H_m, w_m, h_m)])
+    shape = W_m.shape
+    W, H, w, h = (np.ravel(i) for i in (W_m, H_m, w_m, h_m))
+
+    # global min, median and max
+    min_0, max_0 = np.minimum(np.minimum(W, w), 0), np.maximum(np.maximum(W, w), 0)
+    min_1, max_1 = np.minimum(np.minimum(H, h), 0), np.maximum(np.maximum(H, h), 0)
+    mid_0 = np.maximum(np.minimum(W, w), np.minimum(np.maximum(W, w), 0))
+    mid_1 = np.maximum(np.minimum(H, h), np.minimum(np.maximum(H, h), 0))
+
+    # plane sides
+    o = np.zeros_like(W)
+    full_0, low_0, high_0 = max_0 - min_0, mid_0 - min_0, max_0 - mid_0
+    full_1, low_1, high_1 = max_1 - min_1, mid_1 - min_1, max_1 - mid_1
+    zero = (o, o, 0)
+
+    between_0, between_1 = (min_0 < w) & (w < max_0), (min_1 < h) & (h < max_1)
+    cases = [
+        # receiver at corner
+        (
+            ((W == 0) & (H == 0)) | ((w == 0) & (h == 0)) | ((W == 0) & (h == 0)) | ((w == 0) & (H == 0)),
+            [(full_0, full_1, 1), zero, zero, zero]
+        ),
+        # receiver on vertical edge
+        (
+            ((w == 0) | (w == W)) & (0 < h) & (h < H),
+            [(full_0, high_1, 1), (full_0, low_1, 1), zero, zero]
+        ),
+        # receiver on horizontal edge
+        (
+            ((h == 0) | (h == H)) & (0 < w) & (w < W),
+            [(high_0, full_1, 1), (low_0, full_1, 1), zero, zero]
+        ),
+        # receiver within emitter
+        (
+            (0 < w) & (w < W) & (0 < h) & (h < H),
+            [(low_0, low_1, 1), (high_0, high_1, 1), (low_0, high_1, 1), (high_0, low_1, 1)]
+        ),
+        # receiver outside emitter, far right, far left, far top and far bottom
+        (
+            between_1 & (w == max_0),
+            [(full_0, high_1, 1), (full_0, low_1, 1), (high_0, high_1, -1), (high_0, low_1, -1)]
+        ),
+        (
+            between_1 & (w == min_0),
+            [(full_0, high_1, 1), (full_0, low_1, 1), (low_0, high_1, -1), (low_0, low_1, -1)]
+        ),
+        (
+            between_0 & (h == max_1),
+            [(high_0, full_1, 1), (low_0, full_1, 1), (high_0, high_1, -1), (low_0, high_1, -1)]
+        ),
+        (
+            between_0 & (h == min_1),
+            [(high_0, full_1, 1), (low_0, full_1, 1), (high_0, low_1, -1), (low_0, low_1, -1)]
+        ),
+        # receiver outside emitter, 1st, 2nd, 3rd and 4th quadrants
+        (
+            (w == max_0) & (h == max_1),
+            [(full_0, full_1, 1), (high_0, high_1, 1), (high_0, full_1, -1), (full_0, high_1, -1)]
+        ),
+        (
+            (w == max_0) & (h == min_1),
+            [(full_0, full_1, 1), (high_0, low_1, 1), (full_0, low_1, -1), (high_0, full_1, -1)]
+        ),
+        (
+            (w == min_0) & (h == min_1),
+            [(full_0, full_1, 1), (low_0, low_1, 1), (low_0, full_1, -1), (full_0, low_1, -1)]
+        ),
+        (
+            (w == min_0) & (h == max_1),
+            [(full_0, full_1, 1), (low_0, high_1, 1), (low_0, full_1, -1), (full_0, high_1, -1)]
+        ),
+    ]
+
+    # first matching case wins, unknown positions are left as NaN
+    planes = np.full((len(W), 4, 3), np.nan)
+    done = np.zeros((len(W),), dtype=bool)
+    for mask, abcd in cases:
+        m = mask & ~done
+        for k, (x, y, multiplier) in enumerate(abcd):
+            planes[m, k, 0], planes[m, k, 1], planes[m, k, 2] = x[m], y[m], multiplier
+        done |= m
+
+    return planes.reshape(shape + (4, 3))
+
+
+def _test_four_planes_array():
+    # receiver positions on a grid, including emitter corners and edges
+    w, h = np.meshgrid(np.linspace(-10, 20, 31), np.linspace(-5, 15, 21))
+    for W, H in [(10, 10), (10, 4), (0, 10)]:
+        planes = four_planes_array(W, H, w, h)
+        assert planes.shape == w.shape + (4, 3)
+        for i in np.ndindex(w.shape):
+            expected = four_planes(W, H, float(w[i]), float(h[i]))
+            assert np.allclose(planes[i], np.asarray(expected, dtype=np.float64), equal_nan=True)
+
+    # broadcast
+    assert four_planes_array([10, 20], 10, [[1], [2], [3]], 5).shape == (3, 2, 4, 3)
+
+
+def _test_phi_any_br187_array():
+    w, h = np.meshgrid(np.linspace(-10, 20, 31), np.linspace(-5, 15, 21))
+
+    # whole facade grid in one call, against scalar evaluation
+    phi = phi_parallel_any_br187_array(10, 10, w, h, 10)
+    assert phi.shape == w.shape
+    for i in np.ndindex(w.shape):
+        assert abs(phi[i] - phi_parallel_any_br187(10, 10, float(w[i]), float(h[i]), 10)) < 1e-12
+    phi = phi_perpendicular_any_br187_array(10, 10, w, h, 10)
+    for i in np.ndindex(w.shape):
+        assert abs(phi[i] - phi_perpendicular_any_br187(10, 10, float(w[i]), float(h[i]), 10)) < 1e-12
+
+    # reference values, with separation broadcast
+    phi = phi_parallel_any_br187_array(10, 10, [0, 2, 5, 5, 20], [0, 0, 5, 15, 15], [[10], [20]])
+    assert phi.shape == (2, 5)
+    assert np.allclose(phi[0], [0.1385316060, 0.1638694545, 0.2394564705, 0.0843536644, 0.0195607021], atol=1e-8)
+    expected = [phi_parallel_any_br187(10, 10, *i, 20) for i in [(0, 0), (2, 0), (5, 5), (5, 15), (20, 15)]]
+    assert np.allclose(phi[1], expected)
+    assert abs(phi_perpendicular_any_br187_array(10, 10, 0, 2, 10) - 0.04656468770) < 1e-8
+
+
 def _test_phi_parallel_any_br187():
     # All testing values are taken from independent sources
 
@@ -267,5 +802,10 @@ def _test_phi_perpendicular_any_br187():
 
 
 if __name__ == "__main__":
+    _test_four_planes_array()
+    _test_linear_solver_batch()
+    _test_newton_solver()
+    _test_phi_any_br187_array()
+    _test_phi_map_br187()
     _test_phi_perpendicular_any_br187()
     _test_phi_parallel_any_br187()
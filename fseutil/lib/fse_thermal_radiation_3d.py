@@ -1,10 +1,21 @@
+import collections
+import hashlib
 import itertools
+import os
+import tracemalloc
+import warnings
+from typing import Callable
+from typing import Iterable
 from typing import Union
 
 import numpy as np
 # from matplotlib.path import Path
 
-from fseutil.etc.geo import points_in_ploy
+from fseutil.etc.geo import PolygonIndex
+from fseutil.etc.geo import polygon_frame_3d
+from fseutil.etc.geo import triangulate_polygon
+from fseutil.lib.fse_thermal_radiation_3d_kernel import _receiver_kernel
+from fseutil.lib.fse_thermal_radiation_3d_octree import EmitterOctree
 
 
 def polygon_area_2d(x, y):
@@ -25,30 +36,37 @@ def _test_poly_area_2d():
 
 
 def polygon_area_3d(polygon: np.ndarray) -> np.ndarray:
-    """
+    """Calculates area of a planar polygon in any orientation.
 
-    :param polygon:
-    :param n_points:
-    :return:
+    :param polygon: [[x1, y1, z1], [x2, y2, z2], ...], vertices of a planar polygon.
+    :return: area of the polygon.
     """
 
-    area = polygon_area_2d(polygon[:, 0], polygon[:, 1])
+    _, area, _, _ = polygon_frame_3d([polygon])
 
-    return area
+    return area[0]
 
 
-def scatter_in_polygon_2d(polygon: np.ndarray, n_points: int) -> np.ndarray:
-    """Cast n_points number of points on a surface, within a defined polygon, in 2 dimensional space.
+def _test_poly_area_3d():
+    # horizontal, vertical and tilted
+    assert np.allclose(polygon_area_3d(np.asarray([[0, 0, 2], [10, 0, 2], [10, 5, 2], [0, 5, 2]])), 50)
+    assert np.allclose(polygon_area_3d(np.asarray([[0, 0, 0], [0, 4, 0], [0, 4, 3], [0, 0, 3]])), 12)
+    assert np.allclose(polygon_area_3d(np.asarray([[0, 0, 0], [10, 0, 0], [10, 5, 5], [0, 5, 5]])), 50 * 2 ** 0.5)
 
-    :param polygon:     [[x0, y0], [x1, y1], [x2, y2], ... [xn, yn]], each item polygon[i, :] is a point in a 2d space
-                        and all points forms a polygon.
-    :param n_points:    number of dots to be casted onto the surface.
-    :return xy:         a list of [x, y] coordinates represents points casted on the surface.
-    """
 
-    assert isinstance(polygon, np.ndarray) and np.shape(polygon)[1] == 2
-    assert isinstance(n_points, int) and n_points > 0
+def _halton(n: int, base: int, start: int = 1) -> np.ndarray:
+    """Radical inverse (van der Corput) sequence in `base`, elements `start` to `start + n - 1`."""
+    i = np.arange(start, start + n, dtype=np.int64)
+    f = 1.
+    r = np.zeros((n,), dtype=np.float64)
+    while np.any(i > 0):
+        f /= base
+        r += f * (i % base)
+        i //= base
+    return r
 
+
+def _scatter_grid(polygon: np.ndarray, n_points: int) -> np.ndarray:
     # work out x and y boundary
     x1, x2 = np.min(polygon[:, 0]), np.max(polygon[:, 0])
     y1, y2 = np.min(polygon[:, 1]), np.max(polygon[:, 1])
@@ -83,60 +101,230 @@ def scatter_in_polygon_2d(polygon: np.ndarray, n_points: int) -> np.ndarray:
 
     # get the points co-ordinates within the polygon
     xy = np.concatenate([xx, yy], axis=1)
-    xy = xy[points_in_ploy(xy, polygon)]
+    xy = xy[PolygonIndex(polygon).contains(xy)]
 
     return xy
 
 
-def _test_scatter_in_polygon_2d():
-    # points = np.random.uniform(low=-2, high=12, size=10000).reshape(5000, 2)
+def _scatter_stratified(polygon: np.ndarray, n_points: int, seed: int = None) -> np.ndarray:
+    # one jittered point per cell of a bounding box grid, cells are refined until enough points fall inside
+    rng = np.random.RandomState(seed)
+    index = PolygonIndex(polygon)
 
-    x = [0, 10, 10, 6, 10, 4, 0]
-    y = [0, 0, 5, 5, 10, 10, 6]
+    x1, x2 = np.min(polygon[:, 0]), np.max(polygon[:, 0])
+    y1, y2 = np.min(polygon[:, 1]), np.max(polygon[:, 1])
+    n_cells = n_points * (x2 - x1) * (y2 - y1) / polygon_area_2d(polygon[:, 0], polygon[:, 1])
+
+    while True:
+        l = ((x2 - x1) * (y2 - y1) / n_cells) ** 0.5
+        nx, ny = int(np.ceil((x2 - x1) / l)), int(np.ceil((y2 - y1) / l))
+        xx, yy = np.meshgrid(np.arange(nx), np.arange(ny))
+        xy = np.c_[
+            x1 + (xx.ravel() + rng.uniform(size=xx.size)) * (x2 - x1) / nx,
+            y1 + (yy.ravel() + rng.uniform(size=yy.size)) * (y2 - y1) / ny,
+        ]
+        xy = xy[index.contains(xy)]
+        if len(xy) >= n_points:
+            break
+        n_cells *= 1.2 * n_points / max(len(xy), 1)
+
+    # drop surplus points at random, strata remain close to evenly filled
+    return xy[np.sort(rng.choice(len(xy), n_points, replace=False))]
+
+
+def _scatter_halton(polygon: np.ndarray, n_points: int) -> np.ndarray:
+    # 2D Halton sequence (bases 2 and 3) over the bounding box, points outside are skipped and the sequence continues
+    # until enough points fall inside
+    index = PolygonIndex(polygon)
 
-    xy = list(zip(x, y))
+    x1, x2 = np.min(polygon[:, 0]), np.max(polygon[:, 0])
+    y1, y2 = np.min(polygon[:, 1]), np.max(polygon[:, 1])
+    ratio = (x2 - x1) * (y2 - y1) / polygon_area_2d(polygon[:, 0], polygon[:, 1])
 
-    xy = [list(i) for i in xy]
-    polygon = np.array(xy)
+    xy, n_inside, start = [], 0, 1
+    while n_inside < n_points:
+        n = int((n_points - n_inside) * ratio * 1.1) + 16
+        xy_ = np.c_[x1 + _halton(n, 2, start) * (x2 - x1), y1 + _halton(n, 3, start) * (y2 - y1)]
+        xy_ = xy_[index.contains(xy_)]
+        xy.append(xy_)
+        n_inside += len(xy_)
+        start += n
 
-    xy = scatter_in_polygon_2d(polygon, 1000)
+    return np.concatenate(xy)[:n_points]
 
-    print(xy)
 
+def _scatter_triangles(polygon: np.ndarray, n_points: int):
+    # points are drawn directly inside the polygon's triangles, number of points per triangle proportional to its area
+    tri = polygon[triangulate_polygon(polygon)]
+    ab, ac = tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]
+    tri_area = 0.5 * np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0])
 
-def scatter_in_polygon_3d(polygon: np.ndarray, n_points: int) -> np.ndarray:
-    """WIP. Cast n_points number of points on a surface, within a defined polygon, in 3 dimensional space.
-    As WIP, the third dimension will be discarded but returned as orginal inputs.
+    # degenerate triangles, e.g. from collinear vertices, hold no area
+    keep = tri_area > 1e-12 * np.sum(tri_area)
+    tri, ab, ac, tri_area = tri[keep], ab[keep], ac[keep], tri_area[keep]
 
-    :param polygon:
-    :param n_points:
-    :return:
+    n_tri = _allocate_points(tri_area, n_points)
+
+    # Halton points in the unit square, folded onto the unit triangle, one sequence runs on across all triangles
+    i_tri = np.repeat(np.arange(len(tri)), n_tri)
+    u, v = _halton(n_points, 2), _halton(n_points, 3)
+    fold = u + v > 1
+    u[fold], v[fold] = 1 - u[fold], 1 - v[fold]
+
+    xy = tri[i_tri, 0] + u[:, np.newaxis] * ab[i_tri] + v[:, np.newaxis] * ac[i_tri]
+    area = tri_area[i_tri] / n_tri[i_tri]
+
+    # fewer points than triangles, area of triangles without a point is shared by all points
+    area *= np.sum(tri_area) / np.sum(area)
+
+    return xy, area
+
+
+def _allocate_points(weight: np.ndarray, n_points: int) -> np.ndarray:
+    """Splits `n_points` over items in proportion to `weight` by largest remainder, every item takes at least one
+    point when `n_points` is not less than the number of items."""
+    share = n_points * weight / np.sum(weight)
+    n_min = 1 if n_points >= len(weight) else 0
+    n = np.maximum(np.floor(share).astype(int), n_min)
+    while np.sum(n) > n_points:
+        n[np.argmax(np.where(n > n_min, n / share, -np.inf))] -= 1
+    n_remainder = n_points - np.sum(n)
+    if n_remainder > 0:
+        n[np.argsort(n - share, kind='stable')[:n_remainder]] += 1
+    return n
+
+
+def scatter_in_polygon_2d(
+        polygon: np.ndarray,
+        n_points: int,
+        method: str = 'grid',
+        seed: int = None,
+        return_area: bool = False
+) -> Union[np.ndarray, tuple]:
+    """Cast n_points number of points on a surface, within a defined polygon, in 2 dimensional space.
+
+    Sampling methods:
+        grid        bounding box meshgrid clipped to the polygon, the number of returned points drifts from `n_points`.
+        stratified  one jittered point per grid cell, exactly `n_points` points.
+        halton      Halton low discrepancy sequence (bases 2 and 3), exactly `n_points` points.
+        triangle    points drawn directly inside the polygon's (cached) triangulation and allocated by triangle area,
+                    no rejection and exact per point area, exactly `n_points` points.
+
+    :param polygon:     [[x0, y0], [x1, y1], [x2, y2], ... [xn, yn]], each item polygon[i, :] is a point in a 2d space
+                        and all points forms a polygon.
+    :param n_points:    number of dots to be casted onto the surface.
+    :param method:      sampling method, see above.
+    :param seed:        random seed, `stratified` only.
+    :param return_area: also return the area represented by each point.
+    :return xy:         a list of [x, y] coordinates represents points casted on the surface.
+    :return area:       the area represented by each point, only when `return_area` is True.
     """
 
-    z_averaged = np.average(polygon[:, 2])
+    assert isinstance(polygon, np.ndarray) and np.shape(polygon)[1] == 2
+    assert isinstance(n_points, int) and n_points > 0
 
-    xy = scatter_in_polygon_2d(polygon[:, 0:2], n_points)
+    area = None
+    if method == 'grid':
+        xy = _scatter_grid(polygon, n_points)
+    elif method == 'stratified':
+        xy = _scatter_stratified(polygon, n_points, seed)
+    elif method == 'halton':
+        xy = _scatter_halton(polygon, n_points)
+    elif method == 'triangle':
+        xy, area = _scatter_triangles(polygon, n_points)
+    else:
+        raise ValueError(f'Unknown sampling method {method}.')
 
-    xyz = np.c_[xy, np.full(np.shape(xy)[0], z_averaged)]
+    if not return_area:
+        return xy
 
-    return xyz
+    if area is None:
+        area = np.full((len(xy),), polygon_area_2d(polygon[:, 0], polygon[:, 1]) / len(xy), dtype=np.float64)
 
+    return xy, area
 
-def _test_scatter_in_polygon_3d():
-    # points = np.random.uniform(low=-2, high=12, size=10000).reshape(5000, 2)
 
-    x = [0, 10, 10, 6, 10, 4, 0]
-    y = [0, 0, 5, 5, 10, 10, 6]
-    z = [2, 2, 2, 2, 2, 2, 2]
+def _test_scatter_in_polygon_2d():
+    # concave polygon, 82 m2
+    polygon = np.asarray([[0, 0], [10, 0], [10, 5], [6, 5], [10, 10], [4, 10], [0, 6]], dtype=np.float64)
+
+    for method in ['stratified', 'halton']:
+        xy, area = scatter_in_polygon_2d(polygon, 1000, method=method, seed=0, return_area=True)
+        assert len(xy) == 1000
+        assert np.all(PolygonIndex(polygon).contains(xy))
+        assert np.allclose(np.sum(area), 82)
+
+    # concave polygon
+    polygon = np.asarray([[10, 5], [6, 5], [10, 10], [4, 10], [0, 6], [0, 0], [10, 0]], dtype=np.float64)
+    xy, area = scatter_in_polygon_2d(polygon, 999, method='triangle', return_area=True)
+    assert len(xy) == 999
+    assert np.all(PolygonIndex(polygon).contains(xy))
+    assert np.allclose(np.sum(area), 82)
+
+    # few points, weights still sum to the polygon area
+    for n_points in range(1, 12):
+        xy, area = scatter_in_polygon_2d(polygon, n_points, method='triangle', return_area=True)
+        assert len(xy) == n_points
+        assert np.allclose(np.sum(area), 82)
+
+    # star with many vertices, fewer points than triangles
+    angle = np.linspace(0, 2 * np.pi, 50, endpoint=False)
+    radius = np.where(np.arange(50) % 2 == 0, 10., 4.)
+    polygon = np.c_[radius * np.cos(angle), radius * np.sin(angle)]
+    for n_points in [1, 5, 47, 48, 49, 1000]:
+        xy, area = scatter_in_polygon_2d(polygon, n_points, method='triangle', return_area=True)
+        assert len(xy) == n_points
+        assert np.allclose(np.sum(area), polygon_area_2d(polygon[:, 0], polygon[:, 1]))
+
+    # collinear vertices, no point is put on a degenerate triangle
+    polygon = np.asarray([[0, 0], [5, 0], [10, 0], [10, 5], [10, 10], [0, 10]], dtype=np.float64)
+    xy, area = scatter_in_polygon_2d(polygon, 6, method='triangle', return_area=True)
+    assert np.all(area > 0) and np.allclose(np.sum(area), 100)
+
+
+def scatter_in_polygon_3d(
+        polygon: np.ndarray,
+        n_points: int,
+        method: str = 'grid',
+        seed: int = None,
+        return_area: bool = False
+) -> Union[np.ndarray, tuple]:
+    """Cast n_points number of points on a surface, within a defined planar polygon in any orientation, in 3
+    dimensional space. Points are casted in the polygon's local 2D frame and mapped back to 3D.
+
+    :param polygon:     [[x1, y1, z1], [x2, y2, z2], ...], vertices of a planar polygon.
+    :param n_points:    number of dots to be casted onto the surface.
+    :param method:      sampling method, see `scatter_in_polygon_2d`.
+    :param seed:        random seed, see `scatter_in_polygon_2d`.
+    :param return_area: also return the area represented by each point.
+    :return xyz:        a list of [x, y, z] coordinates represents points casted on the surface.
+    :return area:       the area represented by each point, only when `return_area` is True.
+    """
+
+    _, _, origin, axes = polygon_frame_3d([polygon])
+    origin, axes = origin[0], axes[0, 0:2]
+
+    # the local frame is orthonormal, areas are the same in 2D and 3D
+    xy, area = scatter_in_polygon_2d(
+        (np.asarray(polygon, dtype=np.float64) - origin) @ axes.T, n_points, method=method, seed=seed, return_area=True
+    )
+
+    xyz = origin + xy @ axes
+
+    if return_area:
+        return xyz, area
+    return xyz
 
-    xyz = list(zip(x, y, z))
 
-    xyz = [list(i) for i in xyz]
-    polygon = np.array(xyz)
+def _test_scatter_in_polygon_3d():
+    # vertical polygon facing +x at x=3
+    polygon = np.asarray([[3, 0, 0], [3, 4, 0], [3, 4, 3], [3, 0, 3]], dtype=np.float64)
 
-    xy = scatter_in_polygon_3d(polygon, 1000)
+    xyz = scatter_in_polygon_3d(polygon, 1000)
 
-    print(xy)
+    assert np.allclose(xyz[:, 0], 3)
+    assert np.all((0 <= xyz[:, 1]) & (xyz[:, 1] <= 4) & (0 <= xyz[:, 2]) & (xyz[:, 2] <= 3))
+    assert 0.9 < len(xyz) / 1000 < 1.1
 
 
 def unit_vector(vector: np.ndarray):
@@ -169,85 +357,179 @@ def _test_angle_between():
     assert angle_between(v1, v2) == np.pi / 2
 
 
-def phi(xyz: np.ndarray, norm: np.ndarray, area: np.ndarray, indexes: np.ndarray):
-    xyz0 = xyz[indexes.astype(dtype=int)[:, 0]]
-    xyz1 = xyz[indexes.astype(dtype=int)[:, 1]]
-
-    n0_ = norm[indexes.astype(dtype=int)[:, 0]]
-    n1_ = norm[indexes.astype(dtype=int)[:, 1]]
-
-    a_min_b = xyz0 - xyz1
-    d_square = np.einsum("ij,ij->i", a_min_b, a_min_b)
-
-    v01_ = xyz1 - xyz0
-    v10_ = xyz0 - xyz1
-
-    phi_ = np.zeros((len(indexes),), dtype=np.float64)
-
-    for i, v in enumerate(indexes):
-        i0, i1 = int(v[0]), int(v[1])
-
-        # angles between the rays and normals
-        a0 = angle_between(v01_[i], n0_[i])
-        a1 = angle_between(v10_[i], n1_[i])
-
-        # distance
-        # area
-        a = area[i0]
+def _phi_pairs(
+        xyz: np.ndarray,
+        norm: np.ndarray,
+        area: np.ndarray,
+        indexes: np.ndarray,
+        chunk_size: int = 2 ** 20,
+        dtype: type = np.float64,
+) -> np.ndarray:
+    """Batched differential view factor for each [emitter, receiver] pair in `indexes`.
+
+    Cosines are taken straight from normalised dot products, no arccos/cos round trip. Pairs are evaluated in chunks
+    with temporaries allocated once and reused across chunks.
+
+    :param xyz:         [[x, y, z], ...], coordinates of all points.
+    :param norm:        [[x, y, z], ...], normal vector of all points.
+    :param area:        [m2], area represented by each point.
+    :param indexes:     [[emitter, receiver], ...], point index pairs.
+    :param chunk_size:  maximum number of pairs evaluated at once.
+    :param dtype:       floating point precision, np.float32 or np.float64.
+    :return phi_:       view factor of each pair, in the same order as `indexes`.
+    """
+    i0 = indexes[:, 0].astype(dtype=int)
+    i1 = indexes[:, 1].astype(dtype=int)
+
+    # unit normals, normalised once per point rather than once per pair
+    norm = np.asarray(norm, dtype=np.float64)
+    norm_u = np.asarray(norm / np.linalg.norm(norm, axis=1)[:, np.newaxis], dtype=dtype)
+    xyz = np.asarray(xyz, dtype=dtype)
+    area = np.asarray(area, dtype=dtype)
+
+    n = len(i0)
+    phi_ = np.empty((n,), dtype=dtype)
+    step = max(1, min(n, int(chunk_size)))
+    v01_, w_ = np.empty((step, 3), dtype=dtype), np.empty((step, 3), dtype=dtype)
+    d_square, d, cos0, cos1 = (np.empty((step,), dtype=dtype) for _ in range(4))
+
+    for i in range(0, n, step):
+        j0, j1 = i0[i:i + step], i1[i:i + step]
+        m = len(j0)
+
+        # vector array from vertex 0 to 1, v10 is simply -v01
+        np.take(xyz, j1, axis=0, out=v01_[:m])
+        v01_[:m] -= np.take(xyz, j0, axis=0, out=w_[:m])
+        np.einsum("ij,ij->i", v01_[:m], v01_[:m], out=d_square[:m])
+        np.sqrt(d_square[:m], out=d[:m])
+
+        # cosines between the rays and normals
+        np.einsum("ij,ij->i", v01_[:m], np.take(norm_u, j0, axis=0, out=w_[:m]), out=cos0[:m])
+        cos0[:m] /= d[:m]
+        np.clip(cos0[:m], -1.0, 1.0, out=cos0[:m])
+        np.einsum("ij,ij->i", v01_[:m], np.take(norm_u, j1, axis=0, out=w_[:m]), out=cos1[:m])
+        np.negative(cos1[:m], out=cos1[:m])
+        cos1[:m] /= d[:m]
+        np.clip(cos1[:m], -1.0, 1.0, out=cos1[:m])
 
         # view factor
-        aaa = np.cos(a0) * np.cos(a1)
-        bbb = np.pi * d_square[i]
-        phi_[i] = (aaa / bbb * a)
+        np.multiply(cos0[:m], cos1[:m], out=phi_[i:i + m])
+        d_square[:m] *= np.pi
+        phi_[i:i + m] /= d_square[:m]
+        phi_[i:i + m] *= np.take(area, j0, out=d[:m])
 
     return phi_
 
 
-def resultant_heat_flux(xyz: np.ndarray, norm: np.ndarray, area: np.ndarray, temperature: np.ndarray, indexes: np.ndarray):
-
-    xyz0 = xyz[indexes.astype(dtype=int)[:, 0]]
-    xyz1 = xyz[indexes.astype(dtype=int)[:, 1]]
-
-    n0_ = norm[indexes.astype(dtype=int)[:, 0]]
-    n1_ = norm[indexes.astype(dtype=int)[:, 1]]
-
-    a_min_b = xyz0 - xyz1
-    d_square = np.einsum("ij,ij->i", a_min_b, a_min_b)
+class ViewFactorCache:
+    """Cache of per-pair view factors (see `phi`), keyed by a hash of the geometry, i.e. xyz, norm, area and indexes.
 
-    v01_ = xyz1 - xyz0  # vector array from vertex 0 to 1
-    v10_ = xyz0 - xyz1  # vector array from vertex 1 to 0
+    Entries are kept in memory up to `max_bytes`, least recently used first out. With `cache_dir`, entries are also
+    saved as .npz files and loaded back when they are not in memory.
 
-    heat_flux_dosage = 0.
-    phi_ = 0.
-
-    for i, v in enumerate(indexes):
-        i0, i1 = int(v[0]), int(v[1])
-
-        # angles between the rays and normals
-        a0 = angle_between(v01_[i], n0_[i])
-        a1 = angle_between(v10_[i], n1_[i])
-
-        # area
-        a = area[i0]
-
-        # view factor
-        aaa = np.cos(a0) * np.cos(a1)
-        bbb = np.pi * d_square[i]
-        phi = (aaa / bbb) * a
+    :param max_bytes: memory bound of the in-memory tier.
+    :param cache_dir: directory of the on-disk tier, disabled by default.
+    """
 
-        # temperature difference
-        t0 = temperature[i0]
-        t1 = temperature[i1]
-        dt4 = t0**4 - t1**4
+    def __init__(self, max_bytes: int = 2 ** 28, cache_dir: str = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = collections.OrderedDict()
+        self._n_bytes = 0
+
+    @staticmethod
+    def key(xyz: np.ndarray, norm: np.ndarray, area: np.ndarray, indexes: np.ndarray, dtype: type = np.float64) -> str:
+        h = hashlib.sha1()
+        h.update(np.dtype(dtype).str.encode())
+        for arr in (
+                np.asarray(xyz, dtype=np.float64),
+                np.asarray(norm, dtype=np.float64),
+                np.asarray(area, dtype=np.float64),
+                np.asarray(indexes).astype(dtype=int),
+        ):
+            h.update(str(arr.shape).encode())
+            h.update(np.ascontiguousarray(arr).tobytes())
+        return h.hexdigest()
+
+    def phi(
+            self,
+            xyz: np.ndarray,
+            norm: np.ndarray,
+            area: np.ndarray,
+            indexes: np.ndarray,
+            chunk_size: int = 2 ** 20,
+            dtype: type = np.float64,
+    ) -> np.ndarray:
+        """Same as `phi`, computed only when the geometry is not found in the cache. The returned array is read only."""
+        key = self.key(xyz, norm, area, indexes, dtype=dtype)
+
+        # memory
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        # disk
+        phi_ = None
+        path = os.path.join(self.cache_dir, f'{key}.npz') if self.cache_dir else None
+        if path and os.path.isfile(path):
+            with np.load(path) as f:
+                phi_ = f['phi']
+        if phi_ is None:
+            phi_ = _phi_pairs(xyz=xyz, norm=norm, area=area, indexes=indexes, chunk_size=chunk_size, dtype=dtype)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, phi=phi_)
+
+        phi_.flags.writeable = False
+        self._entries[key] = phi_
+        self._n_bytes += phi_.nbytes
+        while self._n_bytes > self.max_bytes and len(self._entries) > 1:
+            _, phi_dropped = self._entries.popitem(last=False)
+            self._n_bytes -= phi_dropped.nbytes
+
+        return phi_
+
+    def clear(self):
+        """Empties the in-memory tier, files in `cache_dir` are kept."""
+        self._entries.clear()
+        self._n_bytes = 0
+
+
+def phi(
+        xyz: np.ndarray,
+        norm: np.ndarray,
+        area: np.ndarray,
+        indexes: np.ndarray,
+        cache: ViewFactorCache = None,
+        chunk_size: int = 2 ** 20,
+        dtype: type = np.float64,
+):
+    if cache is not None:
+        return cache.phi(xyz=xyz, norm=norm, area=area, indexes=indexes, chunk_size=chunk_size, dtype=dtype)
+    return _phi_pairs(xyz=xyz, norm=norm, area=area, indexes=indexes, chunk_size=chunk_size, dtype=dtype)
+
+
+def resultant_heat_flux(
+        xyz: np.ndarray,
+        norm: np.ndarray,
+        area: np.ndarray,
+        temperature: np.ndarray,
+        indexes: np.ndarray,
+        cache: ViewFactorCache = None,
+        chunk_size: int = 2 ** 20,
+        dtype: type = np.float64,
+):
 
-        heat_flux_dosage += 5.67e-8 * 1.0 * dt4 * phi
-        phi_ += phi
+    # geometry only, reused from `cache` when only the temperature changes
+    phi_ = phi(xyz=xyz, norm=norm, area=area, indexes=indexes, cache=cache, chunk_size=chunk_size, dtype=dtype)
 
-    return heat_flux_dosage, phi_
+    # temperature difference, T^4 once per point rather than once per pair
+    t4 = np.asarray(temperature, dtype=np.float64) ** 4
+    dt4 = t4[indexes[:, 0].astype(dtype=int)] - t4[indexes[:, 1].astype(dtype=int)]
 
+    heat_flux_dosage = 5.67e-8 * 1.0 * np.dot(dt4, phi_)
 
-def thermal_radiation_dose(xyz: np.ndarray, heat_flux: np.ndarray, ):
-    pass
+    return heat_flux_dosage, np.sum(phi_)
 
 
 def _test_phi_perpendicular():
@@ -330,6 +612,71 @@ def _test_phi_parallel():
     assert np.allclose(0.1385316, p_sum)
 
 
+def _test_phi_against_angle_between():
+    """To check the batched view factor kernel against the per-pair arccos/cos formulation"""
+
+    rng = np.random.RandomState(0)
+    xyz = rng.uniform(-5, 5, (200, 3))
+    norm = rng.uniform(-1, 1, (200, 3))
+    area = rng.uniform(0.1, 1, (200,))
+    temperature = rng.uniform(300, 1200, (200,))
+
+    indexes = np.asarray(list(itertools.permutations(range(0, 200, 10), 2)))
+
+    phi_ref = np.zeros((len(indexes),), dtype=np.float64)
+    q_ref = 0.
+    for i, (i0, i1) in enumerate(indexes):
+        a0 = angle_between(xyz[i1] - xyz[i0], norm[i0])
+        a1 = angle_between(xyz[i0] - xyz[i1], norm[i1])
+        d_square = np.sum((xyz[i1] - xyz[i0]) ** 2)
+        phi_ref[i] = np.cos(a0) * np.cos(a1) / (np.pi * d_square) * area[i0]
+        q_ref += 5.67e-8 * (temperature[i0] ** 4 - temperature[i1] ** 4) * phi_ref[i]
+
+    assert np.allclose(phi(xyz=xyz, norm=norm, area=area, indexes=indexes), phi_ref, rtol=1e-10, atol=1e-14)
+
+    q, phi_sum = resultant_heat_flux(xyz=xyz, norm=norm, area=area, temperature=temperature, indexes=indexes)
+    assert np.allclose(q, q_ref, rtol=1e-10)
+    assert np.allclose(phi_sum, np.sum(phi_ref), rtol=1e-10)
+
+
+def _test_view_factor_cache():
+    """To check cached view factors are reused and bounded"""
+    import tempfile
+
+    rng = np.random.RandomState(0)
+    xyz = rng.uniform(-5, 5, (100, 3))
+    norm = rng.uniform(-1, 1, (100, 3))
+    area = rng.uniform(0.1, 1, (100,))
+    indexes = np.asarray(list(itertools.permutations(range(0, 100, 5), 2)))
+
+    cache = ViewFactorCache()
+    p_1 = phi(xyz, norm, area, indexes, cache=cache)
+    assert np.allclose(p_1, phi(xyz, norm, area, indexes))
+    assert phi(xyz, norm, area, indexes, cache=cache) is p_1
+
+    # different temperatures, same geometry
+    for t in [500., 1000.]:
+        temperature = np.full((100,), t)
+        temperature[::2] = 293.15
+        q_1, _ = resultant_heat_flux(xyz, norm, area, temperature, indexes, cache=cache)
+        q_2, _ = resultant_heat_flux(xyz, norm, area, temperature, indexes)
+        assert np.allclose(q_1, q_2)
+    assert len(cache._entries) == 1
+
+    # changed geometry is a different entry, LRU bound keeps the latest only
+    cache = ViewFactorCache(max_bytes=p_1.nbytes)
+    phi(xyz, norm, area, indexes, cache=cache)
+    p_2 = phi(xyz, norm, area * 2, indexes, cache=cache)
+    assert np.allclose(p_2, p_1 * 2)
+    assert len(cache._entries) == 1
+
+    # disk tier
+    with tempfile.TemporaryDirectory() as cache_dir:
+        phi(xyz, norm, area, indexes, cache=ViewFactorCache(cache_dir=cache_dir))
+        assert len(os.listdir(cache_dir)) == 1
+        assert np.allclose(phi(xyz, norm, area, indexes, cache=ViewFactorCache(cache_dir=cache_dir)), p_1)
+
+
 def _test_single_receiver():
     """
     Emitter panel:
@@ -385,71 +732,947 @@ def _test_single_receiver():
     print(res)
 
 
+def gridded_temperature_field(axes: tuple, temperature: np.ndarray):
+    """Temperature field tabulated on a regular grid, to be used as a non-uniform `ep_temperature`.
+
+    :param axes: (x, y, z) grid coordinates, each an ascending 1D array or None along a direction the field does not
+        vary, e.g. (None, None, z) for a vertical profile.
+    :param temperature: [K] temperature at grid nodes, in shape of the given axes, e.g. (len(z),) for a vertical profile.
+    :return: a callable, mapping [[x, y, z], ...] to temperatures by multilinear interpolation, clamped to grid bounds.
+    """
+    dims = [(i, np.asarray(a, dtype=np.float64)) for i, a in enumerate(axes) if a is not None]
+    temperature = np.asarray(temperature, dtype=np.float64)
+    if temperature.shape != tuple(len(a) for _, a in dims):
+        raise ValueError(f'Temperature shape {temperature.shape} does not match grid axes.')
+
+    def field(xyz: np.ndarray) -> np.ndarray:
+        xyz = np.reshape(np.asarray(xyz, dtype=np.float64), (-1, 3))
+
+        # lower grid node and interpolation weight along each axis
+        nodes, weights = [], []
+        for i, a in dims:
+            x = np.clip(xyz[:, i], a[0], a[-1])
+            j = np.clip(np.searchsorted(a, x, side='right') - 1, 0, max(len(a) - 2, 0))
+            nodes.append(j)
+            weights.append((x - a[j]) / (a[j + 1] - a[j]) if len(a) > 1 else np.zeros_like(x))
+
+        # sum over the corners of the enclosing grid cell
+        t = np.zeros((len(xyz),), dtype=np.float64)
+        for corner in itertools.product((0, 1), repeat=len(dims)):
+            w = np.ones((len(xyz),), dtype=np.float64)
+            for c, w_ in zip(corner, weights):
+                w = w * (w_ if c else 1 - w_)
+            t += w * temperature[tuple(np.minimum(j + c, len(a) - 1) for c, j, (_, a) in zip(corner, nodes, dims))]
+        return t
+
+    return field
+
+
+def _test_gridded_temperature_field():
+    # vertical profile
+    field = gridded_temperature_field((None, None, [0, 2, 4]), [1200, 1000, 600])
+    xyz = np.asarray([[5, 5, -1], [0, 0, 0], [1, 2, 1], [0, 0, 3], [0, 0, 4], [0, 0, 9]], dtype=np.float64)
+    assert np.allclose(field(xyz), [1200, 1200, 1100, 800, 600, 600])
+
+    # bilinear over x and z, exact for a linear field
+    x, z = np.linspace(0, 10, 6), np.linspace(0, 5, 4)
+    field = gridded_temperature_field((x, None, z), 800 + 10 * x[:, np.newaxis] - 20 * z[np.newaxis, :])
+    xyz = np.random.RandomState(0).uniform(0, 5, (100, 3))
+    assert np.allclose(field(xyz), 800 + 10 * xyz[:, 0] - 20 * xyz[:, 2])
+
+    try:
+        gridded_temperature_field((None, None, [0, 1]), [1000, 900, 800])
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def _sample_emitter(
+        ep_vertices: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_temperature: Union[float, Callable],
+        n_points: int,
+        sampling: str = 'grid'
+):
+    """Discretise an emitter polygon into hot spots.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param ep_temperature: [K] emitter surface temperature, a single value or a callable evaluated once over all hot
+        spot coordinates [[x, y, z], ...], e.g. from `gridded_temperature_field`.
+    :param n_points: number of hot spots to be casted onto the emitter polygon.
+    :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+    :return: (xyz, norm, temperature, area) of the hot spots.
+    """
+
+    # Get coordinates and area of individual hot spots
+    ep_xyz_spots, ep_xyz_area = scatter_in_polygon_3d(
+        polygon=ep_vertices, n_points=n_points, method=sampling, return_area=True
+    )
+
+    # Get norm of individual hot spots
+    ep_xyz_norm = np.zeros_like(ep_xyz_spots, dtype=np.float64)
+    ep_xyz_norm[:, :] = ep_norm
+
+    # Get temperature of individual hot spots
+    if callable(ep_temperature):
+        ep_xyz_temperature = np.reshape(np.asarray(ep_temperature(ep_xyz_spots), dtype=np.float64), (len(ep_xyz_spots),))
+    else:
+        ep_xyz_temperature = np.full(shape=(len(ep_xyz_spots),), fill_value=ep_temperature, dtype=np.float64)
+
+    return ep_xyz_spots, ep_xyz_norm, ep_xyz_temperature, ep_xyz_area
+
+
+def _test_receiver_grid():
+    """To check receiver_grid against repeated single_receiver calls"""
+
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]])
+    ep_norm = np.asarray([0, 0, -1])
+
+    rp = np.asarray([[x, y, 0] for x in np.linspace(-5, 10, 7) for y in np.linspace(-5, 10, 5)], dtype=np.float64)
+    rp_norm = np.asarray([0, 0, 1])
+
+    # small chunk size to make sure receivers are evaluated across many chunks
+    q, p = receiver_grid(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, chunk_size=5000,
+    )
+
+    assert q.shape == (len(rp),) and p.shape == (len(rp),)
+
+    for i, rp_ in enumerate(rp):
+        q_, p_ = single_receiver(
+            ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+            rp_vertices=rp_, rp_norm=rp_norm, rp_temperature=293.15,
+        )
+        assert np.allclose(q[i], q_, rtol=1e-8)
+        assert np.allclose(p[i], p_, rtol=1e-8)
+
+    # far field approximation, exact with a zero opening angle
+    q_0, p_0 = receiver_grid(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, theta=0.,
+    )
+    assert np.allclose(q_0, q, rtol=1e-8) and np.allclose(p_0, p, rtol=1e-8)
+    q_1, _ = receiver_grid(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, theta=0.3,
+    )
+    assert np.max(np.abs(q_1 - q)) < 2e-2 * np.max(np.abs(q))
+
+    # a tree built once and reused, chunk_size applies to the traversal
+    ep_xyz, ep_xyz_norm, ep_xyz_temperature, ep_xyz_area = _sample_emitter(ep, ep_norm, 1153., 1000)
+    tree = EmitterOctree(ep_xyz, ep_xyz_norm, ep_xyz_area, ep_xyz_temperature)
+    for chunk_size in [3000, 2 ** 22]:
+        q_2, _ = receiver_grid(
+            ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+            rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, theta=0.3, chunk_size=chunk_size, octree=tree,
+        )
+        assert np.allclose(q_2, q_1, rtol=1e-12)
+
+    # the tree is evaluated in float64 only
+    try:
+        receiver_grid(
+            ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1153., n_points=1000,
+            rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, theta=0.3, dtype=np.float32,
+        )
+        assert False
+    except ValueError:
+        pass
+
+
 def single_receiver(
         ep_vertices: np.ndarray,
         ep_norm: np.ndarray,
-        ep_temperature: float,
+        ep_temperature: Union[float, Callable],
         n_points: int,
         rp_vertices: np.ndarray,
         rp_norm: np.ndarray,
-        rp_temperature: float
+        rp_temperature: float,
+        sampling: str = 'grid',
+        chunk_size: int = 2 ** 22,
+        dtype: type = np.float64,
 ):
     """Calculates resultant heat flux at a receiver from an emitter.
 
     :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
     :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
-    :param ep_temperature: [K] emitter surface temperature.
+    :param ep_temperature: [K] emitter surface temperature, a single value or a callable of hot spot coordinates, see
+        `_sample_emitter`.
     :param n_points:
     :param rp_vertices:
     :param rp_norm:
     :param rp_temperature:
+    :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+    :param chunk_size: maximum number of hot spots evaluated at once.
+    :param dtype: floating point precision, np.float32 or np.float64, see `receiver_grid`.
     :return:
     """
 
-    global_vertices = np.asarray(ep_vertices)
-
-    ep_xyz = None  # coordinates of sampled points on emitter polygons
-    ep_xyz_norm = None
-    ep_xyz_temperature = None
-    ep_xyz_area = None
-
     # Process Data for Emitter Panel
     # ==============================
 
-    # Get coordinates of individual hot spots
-    ep_xyz_spots = scatter_in_polygon_3d(polygon=ep_vertices, n_points=n_points)
+    ep_xyz_spots, ep_xyz_norm, ep_xyz_temperature, ep_xyz_area = _sample_emitter(
+        ep_vertices=ep_vertices, ep_norm=ep_norm, ep_temperature=ep_temperature, n_points=n_points, sampling=sampling
+    )
+
+    # the single cold spot (i.e. receiver), summed against hot spots without copying them
+    phi_, phi_t4 = _receiver_kernel(
+        ep_xyz=ep_xyz_spots, ep_norm=ep_xyz_norm, ep_t4=ep_xyz_temperature ** 4, ep_area=ep_xyz_area,
+        rp_xyz=np.reshape(np.asarray(rp_vertices, dtype=np.float64), (1, 3)),
+        rp_norm=np.reshape(np.asarray(rp_norm, dtype=np.float64), (1, 3)),
+        chunk_size=chunk_size, dtype=dtype,
+    )
 
-    # Get norm of individual hot spots
-    norm_ = np.zeros_like(ep_xyz_spots)
-    ep_xyz_norm = np.zeros_like(ep_xyz_spots, dtype=np.float64)
-    ep_xyz_norm[:, :] = ep_norm
+    res = 5.67e-8 * 1.0 * (phi_t4[0] - rp_temperature ** 4 * phi_[0])
 
-    # Get temperature of individual hot spots
-    ep_xyz_temperature = np.full(shape=(len(ep_xyz_spots),), fill_value=ep_temperature, dtype=np.float64)
+    return res, phi_[0]
 
-    ep_xyz_area = np.full(shape=np.shape(ep_xyz_spots)[0], fill_value=polygon_area_3d(ep_vertices) / np.shape(ep_xyz_spots)[0], dtype=np.float64)
 
-    n_points = ep_xyz_area.size
+def _test_single_receiver_temperature_field():
+    # a 5 m tall wall, hotter at the bottom
+    ep = np.asarray([[0, 0, 0], [0, 5, 0], [0, 5, 5], [0, 0, 5]], dtype=np.float64)
+    ep_norm = np.asarray([1, 0, 0])
+    rp, rp_norm = np.asarray([4, 2.5, 1]), np.asarray([-1, 0, 0])
+    field = gridded_temperature_field((None, None, [0, 5]), [1300, 700])
 
-    # add the single cold spot (i.e. receiver)
-    ep_xyz = np.concatenate([np.reshape(rp_vertices, (1, rp_vertices.size)), ep_xyz_spots])
-    ep_xyz_norm = np.concatenate([np.reshape(rp_norm, (1, rp_norm.size)), ep_xyz_norm])
-    ep_xyz_temperature = np.concatenate([[rp_temperature], ep_xyz_temperature])
-    ep_xyz_area = np.concatenate([[1], ep_xyz_area])
+    q, p = single_receiver(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=field, n_points=10000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, sampling='halton',
+    )
 
-    indexes = np.zeros((n_points, 2), dtype=int)
-    indexes[:, 0] = np.arange(1, n_points+1, 1)
-    indexes[:, 1] = 0
+    # same hot spots through receiver_grid
+    q_, p_ = receiver_grid(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=field, n_points=10000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15, sampling='halton',
+    )
+    assert np.allclose(q, q_, rtol=1e-8) and np.allclose(p, p_, rtol=1e-8)
+
+    # against the wall split into uniform temperature strips
+    q_expected, p_expected = 0, 0
+    z = np.linspace(0, 5, 51)
+    for z0, z1 in zip(z[:-1], z[1:]):
+        strip = np.asarray([[0, 0, z0], [0, 5, z0], [0, 5, z1], [0, 0, z1]])
+        p_strip = phi_polygon_analytical(strip, ep_norm, rp, rp_norm)
+        q_expected += 5.67e-8 * (field([[0, 0, (z0 + z1) / 2]])[0] ** 4 - 293.15 ** 4) * p_strip
+        p_expected += p_strip
+    assert abs(p - p_expected) / p_expected < 1e-2
+    assert abs(q - q_expected) / q_expected < 1e-2
+
+    # a callable returning a constant is the same as a uniform temperature
+    q_uniform, _ = single_receiver(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=1000., n_points=10000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15,
+    )
+    q_callable, _ = single_receiver(
+        ep_vertices=ep, ep_norm=ep_norm, ep_temperature=lambda xyz: np.full(len(xyz), 1000.), n_points=10000,
+        rp_vertices=rp, rp_norm=rp_norm, rp_temperature=293.15,
+    )
+    assert np.allclose(q_uniform, q_callable, rtol=1e-12)
 
-    res, phi_ = resultant_heat_flux(
-        xyz=ep_xyz,
-        norm=ep_xyz_norm,
-        temperature=ep_xyz_temperature,
-        area=ep_xyz_area,
-        indexes=indexes
+
+def peak_memory(func, *args, **kwargs):
+    """Runs `func` and reports the peak memory it allocated, e.g. to choose `chunk_size` and `dtype`.
+
+    :return: (returned, peak), what `func` returned and [byte] peak memory allocated through Python and NumPy.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    try:
+        returned = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - current
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return returned, peak
+
+
+def _test_receiver_kernel():
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]])
+    rp = np.asarray([[x, y, 0] for x in np.linspace(-5, 10, 40) for y in np.linspace(-5, 10, 50)], dtype=np.float64)
+    kwargs = dict(
+        ep_vertices=ep, ep_norm=np.asarray([0, 0, -1]), ep_temperature=1153., n_points=1000,
+        rp_vertices=rp, rp_norm=np.asarray([0, 0, 1]), rp_temperature=293.15,
     )
 
-    return res, phi_
+    (q, p), peak = peak_memory(receiver_grid, **kwargs)
+
+    # blocks split both ways, including partial blocks
+    for chunk_size in [999, 1001, 12345]:
+        q_, p_ = receiver_grid(chunk_size=chunk_size, **kwargs)
+        assert np.allclose(q_, q, rtol=1e-10) and np.allclose(p_, p, rtol=1e-10)
+
+    # single precision, and peak memory reduced by it and by smaller chunks
+    (q_32, p_32), peak_32 = peak_memory(receiver_grid, dtype=np.float32, **kwargs)
+    assert np.allclose(q_32, q, rtol=1e-4) and np.allclose(p_32, p, rtol=1e-4)
+    assert peak_32 < 0.6 * peak
+    _, peak_chunked = peak_memory(receiver_grid, chunk_size=2 ** 14, **kwargs)
+    assert peak_chunked < 0.2 * peak
+
+    q_, p_ = single_receiver(
+        ep_vertices=ep, ep_norm=np.asarray([0, 0, -1]), ep_temperature=1153., n_points=1000,
+        rp_vertices=rp[0], rp_norm=np.asarray([0, 0, 1]), rp_temperature=293.15, chunk_size=100, dtype=np.float32,
+    )
+    assert np.allclose(q_, q[0], rtol=1e-4) and np.allclose(p_, p[0], rtol=1e-4)
+
+    # single precision terms, sums over hot spots accumulated in float64
+    rng = np.random.RandomState(0)
+    n = 200000
+    ep_xyz = np.c_[rng.uniform(0, 5, n), rng.uniform(0, 5, n), np.full(n, 5.)]
+    p_, p_t4 = _receiver_kernel(
+        ep_xyz=ep_xyz, ep_norm=np.tile([0, 0, -1.], (n, 1)), ep_t4=np.full(n, 1153. ** 4), ep_area=np.full(n, 25 / n),
+        rp_xyz=rp[:2], rp_norm=np.tile([0, 0, 1.], (2, 1)), dtype=np.float32,
+    )
+    assert np.allclose(p_t4, 1153. ** 4 * p_, rtol=1e-7)
+
+
+def receiver_grid(
+        ep_vertices: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_temperature: Union[float, Callable],
+        n_points: int,
+        rp_vertices: np.ndarray,
+        rp_norm: np.ndarray,
+        rp_temperature: Union[float, np.ndarray],
+        chunk_size: int = 2 ** 22,
+        sampling: str = 'grid',
+        theta: float = None,
+        dtype: type = np.float64,
+        octree: EmitterOctree = None,
+):
+    """Calculates resultant heat flux at many receivers from an emitter.
+
+    The emitter is sampled once and receivers are evaluated in chunks, each chunk holds no more than `chunk_size`
+    emitter-receiver pairs in memory. With `theta`, hot spots are clustered in an `EmitterOctree` and distant clusters
+    are evaluated as one aggregated emitter instead.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param ep_temperature: [K] emitter surface temperature, a single value or a callable of hot spot coordinates, see
+        `_sample_emitter`.
+    :param n_points: number of hot spots to be casted onto the emitter polygon.
+    :param rp_vertices: receiver locations, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param rp_norm: receiver facing directions, either a single [x, y, z] shared by all receivers or one per receiver.
+    :param rp_temperature: [K] receiver surface temperature, either a single value or one per receiver.
+    :param chunk_size: maximum number of emitter-receiver pairs evaluated at once.
+    :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+    :param theta: opening angle of the far field approximation, see `EmitterOctree`, None for the exact sum.
+    :param dtype: floating point precision of the exact sum, np.float32 halves memory and bandwidth of the pair terms.
+        np.float64 only with `theta`.
+    :param octree: `EmitterOctree` of the emitter's hot spots, to be reused across calls with `theta`, the emitter is
+        then not sampled again. A temporary tree is built when None.
+    :return: (heat_flux, phi), [W/m2] resultant heat flux and view factor arrays in shape (N,).
+    """
+
+    if octree is not None and theta is None:
+        raise ValueError('theta is required with octree.')
+
+    if theta is not None:
+        if np.dtype(dtype) != np.float64:
+            raise ValueError('EmitterOctree is evaluated in float64 only, dtype is not supported with theta.')
+        if octree is None:
+            ep_xyz, ep_xyz_norm, ep_xyz_temperature, ep_xyz_area = _sample_emitter(
+                ep_vertices=ep_vertices, ep_norm=ep_norm, ep_temperature=ep_temperature, n_points=n_points,
+                sampling=sampling
+            )
+            octree = EmitterOctree(ep_xyz, ep_xyz_norm, ep_xyz_area, ep_xyz_temperature)
+        return octree.heat_flux(
+            rp_vertices, rp_norm, rp_temperature, theta=theta, chunk_size=max(1, chunk_size // max(1, len(octree.xyz)))
+        )
+
+    ep_xyz, ep_xyz_norm, ep_xyz_temperature, ep_xyz_area = _sample_emitter(
+        ep_vertices=ep_vertices, ep_norm=ep_norm, ep_temperature=ep_temperature, n_points=n_points, sampling=sampling
+    )
+
+    rp_xyz = np.reshape(np.asarray(rp_vertices, dtype=np.float64), (-1, 3))
+    n_receivers = rp_xyz.shape[0]
+    rp_xyz_norm = np.broadcast_to(np.asarray(rp_norm, dtype=np.float64), (n_receivers, 3))
+    rp_xyz_temperature = np.broadcast_to(np.asarray(rp_temperature, dtype=np.float64), (n_receivers,))
+
+    phi_, phi_t4 = _receiver_kernel(
+        ep_xyz=ep_xyz, ep_norm=ep_xyz_norm, ep_t4=ep_xyz_temperature ** 4, ep_area=ep_xyz_area,
+        rp_xyz=rp_xyz, rp_norm=rp_xyz_norm, chunk_size=chunk_size, dtype=dtype,
+    )
+    heat_flux = 5.67e-8 * 1.0 * (phi_t4 - rp_xyz_temperature ** 4 * phi_)
+
+    return heat_flux, phi_
+
+
+def receiver_panel(
+        ep_vertices: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_temperature: Union[float, Callable],
+        n_points: int,
+        rp_vertices: np.ndarray,
+        rp_norm: np.ndarray,
+        rp_temperature: float,
+        rp_n_points: int = 100,
+        chunk_size: int = 2 ** 22,
+        sampling: str = 'grid',
+):
+    """Calculates heat flux over a finite receiver polygon from an emitter, surface to surface.
+
+    Both polygons are sampled, the receiver samples are evaluated in blocks by `receiver_grid` against the emitter hot
+    spots, which are sampled once. As the pair kernel cos_e * cos_r / (pi * d^2) is symmetric, the area weighted mean
+    of the receiver samples' view factor is the receiver panel to emitter view factor, and A_r / A_e times it is the
+    emitter to receiver panel view factor by reciprocity.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param ep_temperature: [K] emitter surface temperature, a single value or a callable of hot spot coordinates, see
+        `_sample_emitter`.
+    :param n_points: number of hot spots to be casted onto the emitter polygon.
+    :param rp_vertices: vertices defining a receiver polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param rp_norm: a vector definiting the facing direction of the receiver polygon, in [x, y, z]
+    :param rp_temperature: [K] receiver surface temperature.
+    :param rp_n_points: number of samples to be casted onto the receiver polygon.
+    :param chunk_size: maximum number of emitter-receiver pairs evaluated at once.
+    :param sampling: emitter and receiver sampling method, see `scatter_in_polygon_2d`.
+    :return: (heat_flux_mean, heat_flux_max, heat_flux, phi, rp_xyz), [W/m2] area weighted mean and maximum heat flux
+        over the receiver polygon, and heat flux, view factor and coordinates of each receiver sample.
+    """
+
+    rp_xyz, rp_area = scatter_in_polygon_3d(
+        polygon=rp_vertices, n_points=rp_n_points, method=sampling, return_area=True
+    )
+
+    heat_flux, phi_ = receiver_grid(
+        ep_vertices=ep_vertices, ep_norm=ep_norm, ep_temperature=ep_temperature, n_points=n_points,
+        rp_vertices=rp_xyz, rp_norm=rp_norm, rp_temperature=rp_temperature, chunk_size=chunk_size, sampling=sampling,
+    )
+
+    heat_flux_mean = np.sum(heat_flux * rp_area) / np.sum(rp_area)
+
+    return heat_flux_mean, np.max(heat_flux), heat_flux, phi_, rp_xyz
+
+
+def _test_receiver_panel():
+    # two facing 1 x 1 m plates 1 m apart, panel to panel view factor 0.1998
+    ep = np.asarray([[0, 0, 1], [0, 1, 1], [1, 1, 1], [1, 0, 1]], dtype=np.float64)
+    rp = np.asarray([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float64)
+
+    q_mean, q_max, q, p, xyz = receiver_panel(
+        ep_vertices=ep, ep_norm=[0, 0, -1], ep_temperature=1000., n_points=2000,
+        rp_vertices=rp, rp_norm=[0, 0, 1], rp_temperature=293.15, rp_n_points=400,
+    )
+
+    assert q.shape == p.shape == (len(xyz),)
+    assert abs(q_mean / (5.67e-8 * (1000. ** 4 - 293.15 ** 4)) - 0.1998) < 2e-3
+
+    # peak at the receiver samples nearest to the centre, and the mean is well below it
+    i_max = np.argmax(q)
+    assert q_max == q[i_max]
+    assert np.allclose(p[i_max], phi_polygon_analytical(ep, [0, 0, -1], xyz[i_max], [0, 0, 1]), rtol=1e-2)
+    assert q_mean < 0.9 * q_max
+
+    # against samples evaluated one by one
+    for i in range(0, len(xyz), 50):
+        q_, _ = single_receiver(
+            ep_vertices=ep, ep_norm=np.asarray([0, 0, -1]), ep_temperature=1000., n_points=2000,
+            rp_vertices=xyz[i], rp_norm=np.asarray([0, 0, 1]), rp_temperature=293.15,
+        )
+        assert np.allclose(q[i], q_, rtol=1e-8)
+
+
+def phi_polygon_analytical(ep_vertices: np.ndarray, ep_norm: np.ndarray, rp_vertices: np.ndarray, rp_norm: np.ndarray):
+    """Exact view factor from a differential receiver to a planar polygon emitter, using the contour integral (edge
+    sum) expression:
+
+        phi = 1 / (2 pi) * sum_k(gamma_k * n_r . (g_k x g_k+1) / |g_k x g_k+1|)
+
+    where g_k is the vector from the receiver to emitter vertex k and gamma_k is the angle between g_k and g_k+1. The
+    cost is O(number of polygon edges) per receiver. As with the sampling approach, the emitter is treated as
+    unobstructed and receiver facing cosines are not clipped.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param rp_vertices: receiver location(s), in [x, y, z] or [[x1, y1, z1], [x2, y2, z2], ...]
+    :param rp_norm: receiver facing direction(s), either a single [x, y, z] or one per receiver.
+    :return phi: view factor, a float for a single receiver or an (N,) array.
+    """
+
+    ep_vertices = np.asarray(ep_vertices, dtype=np.float64)
+    rp_vertices = np.asarray(rp_vertices, dtype=np.float64)
+    rp_xyz = np.reshape(rp_vertices, (-1, 3))
+    rp_xyz_norm = np.broadcast_to(np.asarray(rp_norm, dtype=np.float64), rp_xyz.shape)
+    rp_xyz_norm = rp_xyz_norm / np.linalg.norm(rp_xyz_norm, axis=1)[:, np.newaxis]
+
+    # orient the contour anticlockwise when viewed from the emitting side, i.e. Newell normal along `ep_norm`
+    newell = np.sum(np.cross(ep_vertices, np.roll(ep_vertices, -1, axis=0)), axis=0)
+    if np.dot(newell, ep_norm) < 0:
+        ep_vertices = ep_vertices[::-1]
+
+    # (receivers, vertices, 3), vectors from receivers to emitter vertices and to the next vertex
+    g0 = ep_vertices[np.newaxis, :, :] - rp_xyz[:, np.newaxis, :]
+    g1 = np.roll(g0, -1, axis=1)
+
+    g0_x_g1 = np.cross(g0, g1)
+    g0_x_g1_norm = np.linalg.norm(g0_x_g1, axis=2)
+    gamma = np.arctan2(g0_x_g1_norm, np.einsum("ijk,ijk->ij", g0, g1))
+
+    # edges collinear with the receiver contribute nothing
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos_ = np.where(
+            g0_x_g1_norm > 0,
+            np.einsum("ijk,ik->ij", g0_x_g1, rp_xyz_norm) / g0_x_g1_norm,
+            0.
+        )
+
+    phi_ = - np.sum(gamma * cos_, axis=1) / (2 * np.pi)
+
+    if rp_vertices.ndim == 1:
+        return phi_[0]
+    return phi_
+
+
+def _test_phi_polygon_analytical():
+    """To check the edge sum view factor against BR 187 corner values and the hot spots sampling approach"""
+
+    ep = np.asarray([[0, 0, 0], [10, 0, 0], [10, 10, 0], [0, 10, 0]])
+
+    # parallel and perpendicular, receiver at emitter corner, independent of vertices order
+    assert np.allclose(phi_polygon_analytical(ep, [0, 0, 1], [0, 0, 10], [0, 0, -1]), 0.1385316060)
+    assert np.allclose(phi_polygon_analytical(ep[::-1], [0, 0, 1], [0, 0, 10], [0, 0, -1]), 0.1385316060)
+    assert np.allclose(phi_polygon_analytical(ep, [0, 0, 1], [0, 0, 10], [0, 1, 0]), 0.0557341970)
+
+    # parallel, multiple receivers
+    p = phi_polygon_analytical(ep, [0, 0, 1], [[5, 5, 10], [2, 0, 10], [20, 15, 10]], [0, 0, -1])
+    assert np.allclose(p, [0.2394564705, 0.1638694545, 0.0195607021])
+
+    # against hot spots sampling
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]])
+    q_1, phi_1 = single_receiver_analytical(
+        ep_vertices=ep, ep_norm=[0, 0, -1], ep_temperature=1153.,
+        rp_vertices=[2.5, 2.5, 0], rp_norm=[0, 0, 1], rp_temperature=293.15,
+    )
+    q_2, phi_2 = single_receiver(
+        ep_vertices=ep, ep_norm=np.asarray([0, 0, -1]), ep_temperature=1153., n_points=1000,
+        rp_vertices=np.asarray([2.5, 2.5, 0]), rp_norm=np.asarray([0, 0, 1]), rp_temperature=293.15,
+    )
+    assert abs(phi_1 - phi_2) / phi_1 < 0.01
+    assert abs(q_1 - q_2) / q_1 < 0.01
+
+
+def _test_sampling_accuracy():
+    """To check hot spots sampling methods against the edge sum view factor"""
+
+    def error(ep, ep_norm, rp, rp_norm, n_points, sampling):
+        _, phi_ = single_receiver(
+            ep_vertices=ep, ep_norm=np.asarray(ep_norm), ep_temperature=1000., n_points=n_points,
+            rp_vertices=np.asarray(rp), rp_norm=np.asarray(rp_norm), rp_temperature=293.15, sampling=sampling,
+        )
+        phi_analytical = phi_polygon_analytical(ep, ep_norm, rp, rp_norm)
+        return abs(phi_ - phi_analytical) / phi_analytical
+
+    # centred receiver below a 5 x 5 m emitter
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]], dtype=np.float64)
+    err = {i: error(ep, [0, 0, -1], [2.5, 2.5, 0], [0, 0, 1], 1000, i) for i in ['grid', 'halton', 'triangle']}
+    assert err['grid'] < 1e-3  # default, unchanged for existing callers
+    assert err['halton'] < 5e-4
+    assert err['triangle'] < 5e-4
+
+    # L-shaped emitter, off centre receiver close to the emitter
+    ep = np.asarray([[0, 0, 0], [10, 0, 0], [10, 4, 0], [4, 4, 0], [4, 10, 0], [0, 10, 0]], dtype=np.float64)
+    err = {i: error(ep, [0, 0, 1], [0.5, 5, 1], [0, 0, -1], 10000, i) for i in ['grid', 'halton', 'triangle']}
+    assert err['grid'] < 3e-2
+    assert err['halton'] < 2e-3
+    assert err['triangle'] < 5e-3
+
+
+def single_receiver_analytical(
+        ep_vertices: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_temperature: float,
+        rp_vertices: np.ndarray,
+        rp_norm: np.ndarray,
+        rp_temperature: float
+):
+    """Calculates resultant heat flux at a receiver from an emitter, same as `single_receiver` but using the exact
+    edge sum view factor in `phi_polygon_analytical` rather than hot spots sampling.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param ep_temperature: [K] emitter surface temperature.
+    :param rp_vertices: receiver location, in [x, y, z]
+    :param rp_norm: receiver facing direction, in [x, y, z]
+    :param rp_temperature: [K] receiver surface temperature.
+    :return: (heat_flux, phi), [W/m2] resultant heat flux and view factor.
+    """
+
+    phi_ = phi_polygon_analytical(ep_vertices=ep_vertices, ep_norm=ep_norm, rp_vertices=rp_vertices, rp_norm=rp_norm)
+
+    heat_flux = 5.67e-8 * 1.0 * (ep_temperature ** 4 - rp_temperature ** 4) * phi_
+
+    return heat_flux, phi_
+
+
+def _kernel_point_to_receiver(ep_xyz: np.ndarray, ep_norm: np.ndarray, rp_xyz: np.ndarray, rp_norm: np.ndarray):
+    """Differential view factor per unit emitter area, cos0 * cos1 / (pi * d^2), from emitter points `ep_xyz` (N, 3)
+    sharing one unit normal `ep_norm`, to a single receiver `rp_xyz` with unit normal `rp_norm`."""
+    v = rp_xyz - ep_xyz
+    d_square = np.einsum("ij,ij->i", v, v)
+    return (v @ ep_norm) * -(v @ rp_norm) / (np.pi * d_square * d_square)
+
+
+def single_receiver_adaptive(
+        ep_vertices: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_temperature: float,
+        rp_vertices: np.ndarray,
+        rp_norm: np.ndarray,
+        rp_temperature: float,
+        rtol: float = 1e-3,
+        max_evaluations: int = 1000000,
+):
+    """Calculates resultant heat flux at a receiver from an emitter, same as `single_receiver` but the emitter is
+    integrated adaptively rather than with a fixed number of hot spots.
+
+    The emitter polygon is split into a fan of signed triangles (exact for any simple polygon), each triangle is then
+    recursively split into 4. The difference between a triangle's 1 point (centroid) and 4 point estimates is taken as
+    its error, triangles with the largest errors are refined first until the summed error falls within `rtol` * phi.
+    Refinement therefore concentrates where the kernel varies fastest, i.e. close to the receiver.
+
+    :param ep_vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+    :param ep_temperature: [K] emitter surface temperature.
+    :param rp_vertices: receiver location, in [x, y, z]
+    :param rp_norm: receiver facing direction, in [x, y, z]
+    :param rp_temperature: [K] receiver surface temperature.
+    :param rtol: requested relative tolerance on phi.
+    :param max_evaluations: kernel evaluation budget, refinement stops when it would be exceeded and a warning is
+        given if `rtol` is not met by then.
+    :return: (heat_flux, phi, n_evaluations, phi_error), phi_error is the estimated absolute error of phi.
+    """
+
+    ep_vertices = np.asarray(ep_vertices, dtype=np.float64)
+    ep_norm = np.asarray(ep_norm, dtype=np.float64)
+    ep_norm = ep_norm / np.linalg.norm(ep_norm)
+    rp_xyz = np.asarray(rp_vertices, dtype=np.float64).reshape((3,))
+    rp_norm = np.asarray(rp_norm, dtype=np.float64)
+    rp_norm = rp_norm / np.linalg.norm(rp_norm)
+
+    # fan of triangles from the first vertex, signed by their orientation against the emitter normal
+    tri = np.stack([
+        np.broadcast_to(ep_vertices[0], ep_vertices[2:].shape),
+        ep_vertices[1:-1],
+        ep_vertices[2:]
+    ], axis=1)  # (n, 3 vertices, xyz)
+    tri_cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    tri_sign = np.sign(tri_cross @ ep_norm)
+    tri_area = 0.5 * np.linalg.norm(tri_cross, axis=1)
+
+    # 1 point estimates
+    coarse = _kernel_point_to_receiver(np.average(tri, axis=1), ep_norm, rp_xyz, rp_norm) * tri_area * tri_sign
+    n_evaluations = len(tri)
+
+    phi_ = 0.
+    phi_error = 0.
+    while len(tri) > 0:
+        # split each triangle into 4 by its edge midpoints
+        a, b, c = tri[:, 0], tri[:, 1], tri[:, 2]
+        ab, bc, ca = (a + b) / 2, (b + c) / 2, (c + a) / 2
+        children = np.stack([
+            np.stack([a, ab, ca], axis=1),
+            np.stack([ab, b, bc], axis=1),
+            np.stack([ca, bc, c], axis=1),
+            np.stack([bc, ca, ab], axis=1),
+        ], axis=1)  # (n, 4 children, 3 vertices, xyz)
+
+        # 4 point estimates
+        fine_children = _kernel_point_to_receiver(
+            np.average(children, axis=2).reshape((-1, 3)), ep_norm, rp_xyz, rp_norm
+        ).reshape((-1, 4)) * (tri_area * tri_sign / 4)[:, np.newaxis]
+        fine = np.sum(fine_children, axis=1)
+        error = np.abs(fine - coarse)
+        n_evaluations += fine_children.size
+
+        # accept all if the remaining error budget allows, otherwise accept the smallest error triangles within half of
+        # the remaining budget and refine the rest
+        budget = rtol * abs(phi_ + np.sum(fine)) + np.finfo(np.float64).tiny - phi_error
+        if np.sum(error) <= budget or n_evaluations + 16 * len(tri) > max_evaluations:
+            accepted = np.full(error.shape, True)
+        else:
+            order = np.argsort(error)
+            accepted = np.full(error.shape, False)
+            accepted[order[:np.searchsorted(np.cumsum(error[order]), 0.5 * budget, side="right")]] = True
+
+        phi_ += np.sum(fine[accepted])
+        phi_error += np.sum(error[accepted])
+
+        # refine the rest, children 1 point estimates are already known
+        tri = children[~accepted].reshape((-1, 3, 3))
+        coarse = fine_children[~accepted].ravel()
+        tri_sign = np.repeat(tri_sign[~accepted], 4)
+        tri_area = np.repeat(tri_area[~accepted], 4) / 4
+
+    if phi_error > rtol * abs(phi_):
+        warnings.warn(
+            f'Adaptive integration stopped at {n_evaluations} evaluations (max_evaluations {max_evaluations}), '
+            f'estimated relative error {phi_error / max(abs(phi_), np.finfo(np.float64).tiny):.1e} above rtol {rtol}.'
+        )
+
+    heat_flux = 5.67e-8 * 1.0 * (ep_temperature ** 4 - rp_temperature ** 4) * phi_
+
+    return heat_flux, phi_, n_evaluations, phi_error
+
+
+def _test_single_receiver_adaptive():
+    """To check adaptive integration against the exact edge sum view factor"""
+
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]])
+
+    n_evaluations = list()
+    for rp in [[2.5, 1.5, 0], [2.5, 1.5, 4.5]]:
+        phi_exact = phi_polygon_analytical(ep, [0, 0, -1], rp, [0, 0, 1])
+        q, phi_, n, phi_error = single_receiver_adaptive(
+            ep_vertices=ep, ep_norm=[0, 0, -1], ep_temperature=1153.,
+            rp_vertices=rp, rp_norm=[0, 0, 1], rp_temperature=293.15, rtol=1e-3,
+        )
+        assert abs(phi_ - phi_exact) / phi_exact < 1e-3
+        assert phi_error < 1e-3 * phi_
+        n_evaluations.append(n)
+
+    # near field receiver needs more evaluations
+    assert n_evaluations[0] < n_evaluations[1]
+
+    # concave emitter
+    ep = np.asarray([[0, 0, 0], [10, 0, 0], [10, 5, 0], [6, 5, 0], [10, 10, 0], [4, 10, 0], [0, 6, 0]])
+    phi_exact = phi_polygon_analytical(ep, [0, 0, 1], [8, 5, 2], [0, 0, -1])
+    _, phi_, _, _ = single_receiver_adaptive(ep, [0, 0, 1], 1153., [8, 5, 2], [0, 0, -1], 293.15, rtol=1e-3)
+    assert abs(phi_ - phi_exact) / phi_exact < 1e-3
+
+    # evaluation budget ends refinement before rtol is met
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        single_receiver_adaptive(ep, [0, 0, 1], 1153., [8, 5, 2], [0, 0, -1], 293.15, rtol=1e-3)
+        assert len(w) == 0
+        _, phi_, _, phi_error = single_receiver_adaptive(
+            ep, [0, 0, 1], 1153., [2, 2, 0.05], [0, 0, -1], 293.15, rtol=1e-3, max_evaluations=1000
+        )
+        assert phi_error > 1e-3 * phi_ and len(w) == 1
+
+
+def phi_matrix(ep_vertices: list, ep_norm: list, rp_vertices: np.ndarray, rp_norm: np.ndarray) -> np.ndarray:
+    """Receiver to emitter panel view factor matrix, using the exact edge sum view factor `phi_polygon_analytical`.
+
+    :param ep_vertices: a list of emitter polygons, each in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a list of emitter facing directions, each in [x, y, z]
+    :param rp_vertices: receiver locations, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param rp_norm: receiver facing directions, either a single [x, y, z] shared by all receivers or one per receiver.
+    :return phi: (N, P) view factor matrix, N receivers by P emitter panels.
+    """
+    rp_vertices = np.reshape(np.asarray(rp_vertices, dtype=np.float64), (-1, 3))
+    return np.stack([
+        phi_polygon_analytical(ep_vertices=v, ep_norm=n, rp_vertices=rp_vertices, rp_norm=rp_norm)
+        for v, n in zip(ep_vertices, ep_norm)
+    ], axis=1)
+
+
+def thermal_radiation_dose(
+        phi: np.ndarray,
+        time: Iterable,
+        ep_temperature: Iterable,
+        rp_temperature: Union[float, np.ndarray] = 293.15,
+        out: np.ndarray = None,
+) -> np.ndarray:
+    """Time integrated thermal radiation dose, integral of q^(4/3) dt, at receivers.
+
+    Emitter panel temperatures are consumed one time step at a time, e.g. from a generator, each step is turned into
+    receiver heat fluxes through the precomputed view factor matrix `phi` and the dose is accumulated in place (by
+    trapezoidal rule). Memory is therefore O(receivers) regardless of the number of time steps.
+
+    :param phi: (N, P) view factor matrix, N receivers by P emitter panels, see `phi_matrix`.
+    :param time: [s] time of each step, an array or an iterable.
+    :param ep_temperature: [K] emitter panel temperatures of each step, a (T, P) array or an iterable of (P,) arrays.
+    :param rp_temperature: [K] receiver temperature, a single value or one per receiver.
+    :param out: (N,) array the dose is accumulated to, a new zero array by default.
+    :return dose: [(kW/m2)^(4/3) s] (N,) thermal radiation dose, i.e. in thermal dose units.
+    """
+    phi = np.asarray(phi, dtype=np.float64)
+    n_receivers = phi.shape[0]
+
+    if out is None:
+        out = np.zeros((n_receivers,), dtype=np.float64)
+    rp_t4 = np.broadcast_to(np.asarray(rp_temperature, dtype=np.float64), (n_receivers,)) ** 4
+
+    # receiver term, sum(phi * T_r^4), is the same for every step
+    rp_phi_t4 = np.sum(phi, axis=1) * rp_t4
+
+    # preallocated per step receiver arrays
+    q = np.empty((n_receivers,), dtype=np.float64)
+    q_43_prev = np.empty((n_receivers,), dtype=np.float64)
+    q_43 = np.empty((n_receivers,), dtype=np.float64)
+
+    t_prev = None
+    for t, ep_t in zip(time, ep_temperature):
+        # [kW/m2], q = sigma * sum(phi * (T_e^4 - T_r^4))
+        np.dot(phi, np.asarray(ep_t, dtype=np.float64) ** 4, out=q)
+        q -= rp_phi_t4
+        q *= 5.67e-8 * 1.0 / 1000.
+        np.maximum(q, 0, out=q)
+        np.power(q, 4 / 3, out=q_43)
+
+        if t_prev is not None:
+            q_43_prev += q_43
+            q_43_prev *= 0.5 * (t - t_prev)
+            out += q_43_prev
+
+        q_43_prev, q_43 = q_43, q_43_prev
+        t_prev = t
+
+    return out
+
+
+def _test_thermal_radiation_dose():
+    """To check streamed dose against a closed form"""
+
+    ep_vertices = [np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]]), np.asarray([[5, 0, 5], [5, 5, 5], [10, 5, 5], [10, 0, 5]])]
+    ep_norm = [[0, 0, -1], [0, 0, -1]]
+    rp = np.asarray([[x, 2.5, 0] for x in np.linspace(-5, 15, 11)])
+
+    p = phi_matrix(ep_vertices, ep_norm, rp, [0, 0, 1])
+    assert p.shape == (11, 2)
+    assert np.allclose(p[:, 0], phi_polygon_analytical(ep_vertices[0], ep_norm[0], rp, [0, 0, 1]))
+
+    # constant temperatures
+    time = np.arange(0, 601, 1.)
+    ep_temperature = np.tile([1000., 800.], (len(time), 1))
+    q = 5.67e-8 * (p @ np.asarray([1000., 800.]) ** 4 - np.sum(p, axis=1) * 293.15 ** 4) / 1000.
+    dose = thermal_radiation_dose(p, time, ep_temperature)
+    assert np.allclose(dose, q ** (4 / 3) * 600)
+
+    # linearly ramping temperature from a generator, accumulated over two calls
+    def temperature_gen(t_):
+        for t in t_:
+            yield np.asarray([293.15 + t, 293.15 + t])
+
+    dose_1 = thermal_radiation_dose(p, time, temperature_gen(time))
+    dose_2 = thermal_radiation_dose(p, time[:301], temperature_gen(time[:301]))
+    thermal_radiation_dose(p, time[300:], temperature_gen(time[300:]), out=dose_2)
+    assert np.allclose(dose_1, dose_2)
+
+    # against trapezoidal rule on the full flux history
+    q = 5.67e-8 * (p @ (np.tile(293.15 + time, (2, 1)) ** 4) - np.sum(p, axis=1)[:, np.newaxis] * 293.15 ** 4) / 1000.
+    q_43 = q ** (4 / 3)
+    assert np.allclose(dose_1, np.sum((q_43[:, 1:] + q_43[:, :-1]) / 2 * np.diff(time), axis=1))
+
+
+def escape_route_exposure(
+        route_xyz: np.ndarray,
+        speed: float,
+        ep_vertices: list,
+        ep_norm: list,
+        ep_time: np.ndarray,
+        ep_temperature: np.ndarray,
+        rp_norm: np.ndarray,
+        rp_temperature: float = 293.15,
+        t_start: float = 0.,
+        ds_max: float = 1.,
+        ds_min: float = 0.01,
+        rtol: float = 0.01,
+):
+    """Incident heat flux and cumulative thermal radiation dose of an occupant walking along an escape route.
+
+    The route is sampled at no more than `ds_max` apart and intervals whose end flux differs by more than `rtol` of the
+    peak flux are halved, down to `ds_min`, so samples concentrate where the flux gradient is steep. All samples are
+    evaluated in one vectorised pass per refinement, with emitter panel temperatures interpolated at the time the
+    occupant reaches each sample.
+
+    :param route_xyz: [m] route polyline, in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param speed: [m/s] walking speed.
+    :param ep_vertices: a list of emitter polygons, each in [[x1, y1, z1], [x2, y2, z2], ...]
+    :param ep_norm: a list of emitter facing directions, each in [x, y, z]
+    :param ep_time: [s] (T,) time of the emitter temperature history.
+    :param ep_temperature: [K] (T, P) emitter panel temperature history.
+    :param rp_norm: receiver (occupant) facing direction, in [x, y, z]
+    :param rp_temperature: [K] receiver temperature.
+    :param t_start: [s] time the occupant starts at the first route vertex.
+    :param ds_max: [m] maximum distance between route samples.
+    :param ds_min: [m] minimum distance between route samples, refinement stops at this.
+    :param rtol: flux change between neighbouring samples allowed, relative to the peak flux.
+    :return: (time, xyz, heat_flux, dose), [s] (n,) time, [m] (n, 3) position, [W/m2] (n,) incident heat flux and
+             [(kW/m2)^(4/3) s] (n,) cumulative thermal radiation dose along the route.
+    """
+    route_xyz = np.asarray(route_xyz, dtype=np.float64).reshape((-1, 3))
+    ep_time = np.asarray(ep_time, dtype=np.float64)
+    ep_temperature = np.asarray(ep_temperature, dtype=np.float64).reshape((len(ep_time), -1))
+
+    # route parametrised by distance walked
+    route_s = np.concatenate([[0.], np.cumsum(np.linalg.norm(np.diff(route_xyz, axis=0), axis=1))])
+
+    def flux(s_):
+        xyz_ = np.stack([np.interp(s_, route_s, route_xyz[:, i]) for i in range(3)], axis=1)
+        t_ = t_start + s_ / speed
+        ep_t4 = np.stack([np.interp(t_, ep_time, ep_temperature[:, i]) for i in range(ep_temperature.shape[1])], axis=1) ** 4
+        phi_ = phi_matrix(ep_vertices=ep_vertices, ep_norm=ep_norm, rp_vertices=xyz_, rp_norm=rp_norm)
+        return 5.67e-8 * 1.0 * np.sum(phi_ * (ep_t4 - rp_temperature ** 4), axis=1)
+
+    # initial samples, route vertices included
+    s = np.unique(np.concatenate([
+        np.linspace(0, route_s[-1], int(np.ceil(route_s[-1] / ds_max)) + 1),
+        route_s
+    ]))
+    q = flux(s)
+
+    # refine steep intervals, only new samples are evaluated
+    while True:
+        refine = (np.abs(np.diff(q)) > rtol * np.max(np.abs(q))) & (np.diff(s) > 2 * ds_min)
+        if not np.any(refine):
+            break
+        s_new = ((s[:-1] + s[1:]) / 2)[refine]
+        s, q = np.concatenate([s, s_new]), np.concatenate([q, flux(s_new)])
+        order = np.argsort(s)
+        s, q = s[order], q[order]
+
+    time = t_start + s / speed
+    xyz = np.stack([np.interp(s, route_s, route_xyz[:, i]) for i in range(3)], axis=1)
+
+    # cumulative dose, trapezoidal rule as in `thermal_radiation_dose`
+    q_43 = (np.maximum(q, 0) / 1000.) ** (4 / 3)
+    dose = np.concatenate([[0.], np.cumsum((q_43[1:] + q_43[:-1]) / 2 * np.diff(time))])
+
+    return time, xyz, q, dose
+
+
+def _test_escape_route_exposure():
+    """To check route exposure against direct evaluation"""
+
+    # 5 x 5 m facade panel, occupant walks past at 5 m facing the panel while the fire grows
+    ep_vertices = [np.asarray([[0, 0, 0], [5, 0, 0], [5, 0, 5], [0, 0, 5]])]
+    ep_norm = [[0, -1, 0]]
+    route = np.asarray([[-20, -5, 1.5], [2.5, -5, 1.5], [25, -5, 1.5]])
+    ep_time = np.asarray([0, 30, 1000])
+    ep_temperature = np.asarray([[293.15], [1153.], [1153.]])
+
+    kwargs = dict(
+        route_xyz=route, speed=1.2, ep_vertices=ep_vertices, ep_norm=ep_norm, ep_time=ep_time,
+        ep_temperature=ep_temperature, rp_norm=[0, 1, 0],
+    )
+    time, xyz, q, dose = escape_route_exposure(ds_max=2., **kwargs)
+
+    # walking time
+    s = np.concatenate([[0], np.cumsum(np.linalg.norm(np.diff(xyz, axis=0), axis=1))])
+    assert np.allclose(time, s / 1.2)
+
+    # samples are refined close to the panel only
+    ds = np.diff(s)
+    near = np.abs(xyz[:-1, 0] - 2.5) < 5
+    assert np.max(ds[near]) < 0.5 * np.max(ds[~near])
+
+    # flux at samples
+    for i in range(0, len(time), 5):
+        t_ = np.interp(time[i], ep_time, ep_temperature[:, 0])
+        q_expected, _ = single_receiver_analytical(ep_vertices[0], ep_norm[0], t_, xyz[i], [0, 1, 0], 293.15)
+        assert np.allclose(q[i], q_expected)
+
+    # dose against uniform fine sampling
+    _, _, _, dose_fine = escape_route_exposure(ds_max=0.05, rtol=np.inf, **kwargs)
+    assert np.all(np.diff(dose) >= 0)
+    assert abs(dose[-1] - dose_fine[-1]) / dose_fine[-1] < 0.01
 
 
 def heat_flux_to_temperature(heat_flux: float, exposed_temperature: float = 293.15):
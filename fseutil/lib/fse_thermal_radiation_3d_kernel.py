@@ -0,0 +1,87 @@
+from typing import Callable
+
+import numpy as np
+
+
+def _receiver_kernel(
+        ep_xyz: np.ndarray,
+        ep_norm: np.ndarray,
+        ep_t4: np.ndarray,
+        ep_area: np.ndarray,
+        rp_xyz: np.ndarray,
+        rp_norm: np.ndarray,
+        chunk_size: int = 2 ** 22,
+        dtype: type = np.float64,
+        occluded: Callable = None,
+):
+    """Sums view factor and T^4 weighted view factor of all hot spots at each receiver.
+
+    Pairs are evaluated in (receivers, hot spots) blocks of no more than `chunk_size` elements, in `dtype`. The three
+    block temporaries are allocated once and reused across blocks. Sums over hot spots are accumulated in float64,
+    for other dtypes the T^4 weighted terms are formed in a spare block buffer and summed with a float64 accumulator.
+
+    With `occluded`, only mutually facing pairs are counted and `occluded(ep_index, rp_index)` is called once per
+    block with index arrays of the facing pairs, returning True for pairs that are blocked, e.g. `BVH.occluded`.
+
+    :return: (phi, phi_t4), arrays in shape (N,) of receivers.
+    """
+    # shift the origin to the emitter centroid to limit cancellation in the expanded distance terms below
+    origin = np.mean(ep_xyz, axis=0)
+    e = np.asarray(ep_xyz - origin, dtype=dtype)
+    en = np.asarray(ep_norm / np.linalg.norm(ep_norm, axis=1)[:, np.newaxis], dtype=dtype)
+    r_all = np.asarray(rp_xyz - origin, dtype=dtype)
+    rn_all = np.asarray(rp_norm / np.linalg.norm(rp_norm, axis=1)[:, np.newaxis], dtype=dtype)
+    ep_t4, ep_area = np.asarray(ep_t4, dtype=dtype), np.asarray(ep_area, dtype=dtype)
+
+    e_sq, e_dot_en = np.einsum("ij,ij->i", e, e), np.einsum("ij,ij->i", e, en)
+    r_sq_all, r_dot_rn_all = np.einsum("ij,ij->i", r_all, r_all), np.einsum("ij,ij->i", r_all, rn_all)
+
+    n_emitters, n_receivers = len(e), len(r_all)
+    cols = max(1, min(n_emitters, int(chunk_size)))
+    rows = max(1, min(n_receivers, int(chunk_size) // cols))
+    buffers = [np.empty((rows * cols,), dtype=dtype) for _ in range(3)]
+
+    phi_ = np.zeros((n_receivers,), dtype=np.float64)
+    phi_t4 = np.zeros((n_receivers,), dtype=np.float64)
+    for i in range(0, n_receivers, rows):
+        r, rn = r_all[i:i + rows], rn_all[i:i + rows]
+        r_sq, r_dot_rn = r_sq_all[i:i + rows, np.newaxis], r_dot_rn_all[i:i + rows, np.newaxis]
+        for j in range(0, n_emitters, cols):
+            e_ = e[j:j + cols]
+            d_square, v_dot_en, v_dot_rn = (b_[:len(r) * len(e_)].reshape((len(r), len(e_))) for b_ in buffers)
+
+            # with v = r - e the ray from emitter to receiver, all terms below are (receivers, emitters) matrices built
+            # from matrix products, avoiding a (receivers, emitters, 3) temporary
+            np.matmul(r, e_.T, out=d_square)
+            d_square *= -2
+            d_square += r_sq
+            d_square += e_sq[np.newaxis, j:j + cols]
+            np.matmul(r, en[j:j + cols].T, out=v_dot_en)
+            v_dot_en -= e_dot_en[np.newaxis, j:j + cols]
+            np.matmul(rn, e_.T, out=v_dot_rn)  # -v.n1
+            v_dot_rn -= r_dot_rn
+
+            if occluded is not None:
+                visible = (v_dot_en > 0) & (v_dot_rn > 0)
+                i_r, i_e = np.nonzero(visible)
+                blocked = occluded(j + i_e, i + i_r)
+                visible[i_r[blocked], i_e[blocked]] = False
+
+            # view factor, cos0 * cos1 / (pi * d^2) * a = (v.n0) * (-v.n1) / (pi * d^4) * a, in place of v_dot_en
+            p = v_dot_en
+            p *= v_dot_rn
+            d_square *= d_square
+            d_square *= np.pi
+            p /= d_square
+            p *= ep_area[np.newaxis, j:j + cols]
+            if occluded is not None:
+                p *= visible
+
+            phi_[i:i + rows] += np.sum(p, axis=1, dtype=np.float64)
+            if p.dtype == np.float64:
+                phi_t4[i:i + rows] += p @ ep_t4[j:j + cols]
+            else:
+                np.multiply(p, ep_t4[np.newaxis, j:j + cols], out=d_square)
+                phi_t4[i:i + rows] += np.sum(d_square, axis=1, dtype=np.float64)
+
+    return phi_, phi_t4
@@ -0,0 +1,240 @@
+from typing import Union
+
+import numpy as np
+
+from fseutil.lib.fse_thermal_radiation_3d_kernel import _receiver_kernel
+
+
+class EmitterOctree:
+    """Octree over emitter hot spots, to approximate the heat flux at many receivers Barnes–Hut style.
+
+    The view factor kernel of a hot spot, (v . n_e) * (-v . n_r) / (pi * d^4) * a with v the ray from the hot spot to a
+    receiver, is linear in the area weighted normal a * n_e. Hot spots in a cluster are therefore lumped into one
+    aggregated emitter at their area weighted centroid, carrying the sums of a * n_e and a * T^4 * n_e. A cluster is
+    evaluated as a whole when its radius seen from the receiver is within the opening angle `theta`, i.e. radius / d <
+    theta, otherwise its children are visited and leaves are summed hot spot by hot spot. `theta` = 0 gives the exact
+    sum and larger values trade accuracy for speed. Both sums are lumped at the same area weighted centroid, where
+    temperature varies within a cluster the a * T^4 sum is off centre and its error is first order in theta. See
+    `error` for the error against the exact sum.
+
+    :param xyz:         [[x, y, z], ...], coordinates of hot spots, e.g. from `_sample_emitter`.
+    :param norm:        [[x, y, z], ...], normal vector of hot spots, or a single [x, y, z] shared by all.
+    :param area:        [m2], area of hot spots.
+    :param temperature: [K] temperature of hot spots, a single value or one per hot spot.
+    :param leaf_size:   maximum number of hot spots in a leaf node.
+    """
+
+    def __init__(
+            self,
+            xyz: np.ndarray,
+            norm: np.ndarray,
+            area: np.ndarray,
+            temperature: Union[float, np.ndarray],
+            leaf_size: int = 16,
+    ):
+        self.xyz = np.asarray(xyz, dtype=np.float64).reshape((-1, 3))
+        n = len(self.xyz)
+        norm = np.broadcast_to(np.asarray(norm, dtype=np.float64), (n, 3))
+        area = np.broadcast_to(np.asarray(area, dtype=np.float64), (n,))
+        t4 = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (n,)) ** 4
+
+        # area weighted unit normals, with and without T^4
+        self.norm = norm / np.linalg.norm(norm, axis=1)[:, np.newaxis]
+        self.area, self.t4 = area, t4
+        self.an = self.norm * area[:, np.newaxis]
+        self.ant4 = self.an * t4[:, np.newaxis]
+
+        self.order = np.arange(n)
+        node_centroid, node_radius, node_an, node_ant4 = [], [], [], []
+        node_start, node_count, node_children = [], [], []
+
+        def new_node():
+            for l_ in (node_centroid, node_an, node_ant4):
+                l_.append(np.zeros((3,)))
+            for l_ in (node_radius, node_start, node_count):
+                l_.append(0)
+            node_children.append([-1] * 8)
+            return len(node_start) - 1
+
+        xyz_min, xyz_max = (np.min(self.xyz, axis=0), np.max(self.xyz, axis=0)) if n > 0 else (np.zeros(3), np.zeros(3))
+        stack = [(new_node(), 0, n, (xyz_min + xyz_max) / 2, np.max(xyz_max - xyz_min) / 2)]
+        while stack:
+            node, start, end, center, half = stack.pop()
+            idx = self.order[start:end]
+            node_start[node], node_count[node] = start, end - start
+            if len(idx) == 0:
+                continue
+
+            # aggregated emitter, radius is measured from the centroid so the opening test bounds every hot spot
+            a = area[idx]
+            centroid = np.sum(self.xyz[idx] * a[:, np.newaxis], axis=0) / max(np.sum(a), np.finfo(np.float64).tiny)
+            node_centroid[node] = centroid
+            node_radius[node] = np.sqrt(np.max(np.sum((self.xyz[idx] - centroid) ** 2, axis=1)))
+            node_an[node], node_ant4[node] = np.sum(self.an[idx], axis=0), np.sum(self.ant4[idx], axis=0)
+
+            if end - start <= leaf_size or half <= 0:
+                continue
+
+            # split into octants, hot spots of each child are kept contiguous in `order`
+            octant = np.sum((self.xyz[idx] >= center) * [1, 2, 4], axis=1)
+            self.order[start:end] = idx[np.argsort(octant, kind='stable')]
+            counts = np.bincount(octant, minlength=8)
+            offsets = start + np.concatenate([[0], np.cumsum(counts)])
+            for k in np.nonzero(counts)[0]:
+                child = new_node()
+                node_children[node][k] = child
+                sign = (np.asarray([k & 1, k & 2, k & 4]) > 0) * 2 - 1
+                stack.append((child, offsets[k], offsets[k + 1], center + sign * half / 2, half / 2))
+
+        self.node_centroid, self.node_radius = np.asarray(node_centroid), np.asarray(node_radius, dtype=np.float64)
+        self.node_an, self.node_ant4 = np.asarray(node_an), np.asarray(node_ant4)
+        self.node_start, self.node_count = np.asarray(node_start, dtype=int), np.asarray(node_count, dtype=int)
+        self.node_children = np.asarray(node_children, dtype=int)
+        self.node_leaf = np.all(self.node_children < 0, axis=1)
+
+    def heat_flux(
+            self,
+            rp_xyz: np.ndarray,
+            rp_norm: np.ndarray,
+            rp_temperature: Union[float, np.ndarray],
+            theta: float = 0.3,
+            chunk_size: int = 2 ** 12,
+    ):
+        """Calculates resultant heat flux at receivers from all hot spots in the tree.
+
+        :param rp_xyz:          receiver locations, in [[x1, y1, z1], [x2, y2, z2], ...]
+        :param rp_norm:         receiver facing directions, either a single [x, y, z] shared by all receivers or one
+                                per receiver.
+        :param rp_temperature:  [K] receiver surface temperature, either a single value or one per receiver.
+        :param theta:           opening angle, clusters with radius / distance below `theta` are evaluated as one
+                                aggregated emitter, 0 for the exact sum.
+        :param chunk_size:      number of receivers traversed at once.
+        :return:                (heat_flux, phi), [W/m2] resultant heat flux and view factor arrays in shape (N,).
+        """
+        rp_xyz = np.reshape(np.asarray(rp_xyz, dtype=np.float64), (-1, 3))
+        n_receivers = len(rp_xyz)
+        rp_norm = np.broadcast_to(np.asarray(rp_norm, dtype=np.float64), (n_receivers, 3))
+        rp_norm = rp_norm / np.linalg.norm(rp_norm, axis=1)[:, np.newaxis]
+        rp_t4 = np.broadcast_to(np.asarray(rp_temperature, dtype=np.float64), (n_receivers,)) ** 4
+
+        phi_ = np.zeros((n_receivers,), dtype=np.float64)
+        phi_t4 = np.zeros((n_receivers,), dtype=np.float64)
+        if len(self.xyz) > 0:
+            for i in range(0, n_receivers, chunk_size):
+                phi_[i:i + chunk_size], phi_t4[i:i + chunk_size] = self._phi(
+                    rp_xyz[i:i + chunk_size], rp_norm[i:i + chunk_size], theta
+                )
+
+        return 5.67e-8 * 1.0 * (phi_t4 - rp_t4 * phi_), phi_
+
+    def error(
+            self,
+            rp_xyz: np.ndarray,
+            rp_norm: np.ndarray,
+            rp_temperature: Union[float, np.ndarray],
+            theta: float = 0.3,
+            chunk_size: int = 2 ** 12,
+    ):
+        """Error of `heat_flux` at opening angle `theta` against the exact sum over all hot spots, same parameters as
+        `heat_flux`.
+
+        :return: (heat_flux_error, phi_error), approximated less exact values, arrays in shape (N,).
+        """
+        q, p = self.heat_flux(rp_xyz, rp_norm, rp_temperature, theta=theta, chunk_size=chunk_size)
+
+        # exact sum, evaluated directly by the block kernel rather than by opening every cluster
+        rp_xyz = np.reshape(np.asarray(rp_xyz, dtype=np.float64), (-1, 3))
+        n_receivers = len(rp_xyz)
+        rp_norm = np.broadcast_to(np.asarray(rp_norm, dtype=np.float64), (n_receivers, 3))
+        rp_t4 = np.broadcast_to(np.asarray(rp_temperature, dtype=np.float64), (n_receivers,)) ** 4
+
+        p_exact, p_t4_exact = np.zeros((n_receivers,)), np.zeros((n_receivers,))
+        if len(self.xyz) > 0:
+            p_exact, p_t4_exact = _receiver_kernel(self.xyz, self.norm, self.t4, self.area, rp_xyz, rp_norm)
+
+        return q - 5.67e-8 * 1.0 * (p_t4_exact - rp_t4 * p_exact), p - p_exact
+
+    def _phi(self, r: np.ndarray, rn: np.ndarray, theta: float):
+        phi_ = np.zeros((len(r),), dtype=np.float64)
+        phi_t4 = np.zeros((len(r),), dtype=np.float64)
+
+        def add(rec_, v_, an_, ant4_):
+            k = -np.einsum("ij,ij->i", v_, rn[rec_]) / (np.pi * np.einsum("ij,ij->i", v_, v_) ** 2)
+            phi_[:] += np.bincount(rec_, weights=k * np.einsum("ij,ij->i", v_, an_), minlength=len(r))
+            phi_t4[:] += np.bincount(rec_, weights=k * np.einsum("ij,ij->i", v_, ant4_), minlength=len(r))
+
+        # frontier of (receiver, node) pairs still to be visited
+        rec, node = np.arange(len(r)), np.zeros((len(r),), dtype=int)
+        while len(rec) > 0:
+            # far clusters, as one aggregated emitter
+            v = r[rec] - self.node_centroid[node]
+            far = self.node_radius[node] ** 2 < theta ** 2 * np.einsum("ij,ij->i", v, v)
+            add(rec[far], v[far], self.node_an[node[far]], self.node_ant4[node[far]])
+            rec, node = rec[~far], node[~far]
+
+            # near leaves, hot spot by hot spot
+            leaf = self.node_leaf[node]
+            rec_, node_ = rec[leaf], node[leaf]
+            n_ = self.node_count[node_]
+            rec_ = np.repeat(rec_, n_)
+            i_hs = np.repeat(self.node_start[node_], n_) + np.arange(np.sum(n_)) - np.repeat(np.cumsum(n_) - n_, n_)
+            i_hs = self.order[i_hs]
+            add(rec_, r[rec_] - self.xyz[i_hs], self.an[i_hs], self.ant4[i_hs])
+
+            # near internal nodes, visit their children
+            rec, node = np.repeat(rec[~leaf], 8), self.node_children[node[~leaf]].ravel()
+            rec, node = rec[node >= 0], node[node >= 0]
+
+        return phi_, phi_t4
+
+
+def _test_emitter_octree():
+    rng = np.random.RandomState(0)
+
+    # hot spots on two perpendicular walls, the second one hotter
+    n = 4000
+    xyz = np.concatenate([
+        np.c_[rng.uniform(0, 10, n), rng.uniform(0, 5, n), np.full(n, 5.)],
+        np.c_[np.zeros(n), rng.uniform(0, 5, n), rng.uniform(0, 5, n)],
+    ])
+    norm = np.concatenate([np.tile([0, 0, -1.], (n, 1)), np.tile([1., 0, 0], (n, 1))])
+    area = np.concatenate([np.full(n, 50. / n), np.full(n, 25. / n)])
+    temperature = np.concatenate([np.full(n, 1000.), np.full(n, 1200.)])
+
+    rp = np.asarray([[x, y, z] for x in np.linspace(2, 30, 8) for y in np.linspace(-5, 10, 4) for z in [-2, 0]])
+    rp_norm = np.tile([-1, 0, 1.], (len(rp), 1))
+
+    # exact sum, direct
+    v = rp[:, np.newaxis, :] - xyz[np.newaxis, :, :]
+    d_square = np.einsum("ijk,ijk->ij", v, v)
+    p = np.einsum("ijk,jk->ij", v, norm) * -np.einsum("ijk,ik->ij", v, rp_norm)
+    p /= np.linalg.norm(rp_norm, axis=1)[:, np.newaxis]
+    p = p / (np.pi * d_square ** 2) * area
+    p_expected = np.sum(p, axis=1)
+    q_expected = 5.67e-8 * (p @ temperature ** 4 - 293.15 ** 4 * p_expected)
+
+    tree = EmitterOctree(xyz, norm, area, temperature, leaf_size=8)
+
+    # theta = 0 opens every cluster
+    q, p = tree.heat_flux(rp, rp_norm, 293.15, theta=0., chunk_size=7)
+    assert np.allclose(q, q_expected, rtol=1e-9)
+    assert np.allclose(p, p_expected, rtol=1e-9)
+
+    # error reduces with the opening angle and is reported against the exact sum
+    err_last = np.inf
+    for theta in [1., 0.5, 0.2]:
+        q_err, p_err = tree.error(rp, rp_norm, 293.15, theta=theta)
+        assert np.allclose(q_err, tree.heat_flux(rp, rp_norm, 293.15, theta=theta)[0] - q_expected, atol=1e-6)
+        err = np.max(np.abs(q_err)) / np.max(np.abs(q_expected))
+        assert err < err_last
+        err_last = err
+    assert err_last < 1e-2
+
+    # single leaf and empty trees
+    tree = EmitterOctree(xyz, norm, area, temperature, leaf_size=len(xyz))
+    assert np.allclose(tree.heat_flux(rp, rp_norm, 293.15, theta=0.)[0], q_expected)
+    assert np.all(EmitterOctree(np.zeros((0, 3)), [0, 0, 1], 1., 1000.).heat_flux(rp, rp_norm, 293.15)[1] == 0)
+
+
+if __name__ == '__main__':
+    _test_emitter_octree()
@@ -0,0 +1,223 @@
+import warnings
+from typing import Union
+
+import numpy as np
+
+
+class CSRMatrix:
+    """Minimal compressed sparse row matrix, to hold view factor matrices without scipy.
+
+    :param indptr:  (n_rows + 1,) row pointers, entries of row i are at indptr[i]:indptr[i+1].
+    :param indices: (nnz,) column index of each entry.
+    :param data:    (nnz,) value of each entry.
+    :param shape:   (n_rows, n_cols).
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: tuple):
+        self.indptr = np.asarray(indptr, dtype=int)
+        self.indices = np.asarray(indices, dtype=int)
+        self.data = np.asarray(data, dtype=np.float64)
+        self.shape = shape
+        self._rows = np.repeat(np.arange(shape[0]), np.diff(self.indptr))
+
+    @classmethod
+    def from_coo(cls, rows: np.ndarray, cols: np.ndarray, data: np.ndarray, shape: tuple):
+        order = np.lexsort((cols, rows))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=shape[0]))])
+        return cls(indptr, cols[order], data[order], shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        return np.bincount(self._rows, weights=self.data * x[self.indices], minlength=self.shape[0])
+
+    def toarray(self) -> np.ndarray:
+        arr = np.zeros(self.shape, dtype=np.float64)
+        arr[self._rows, self.indices] = self.data
+        return arr
+
+
+def view_factor_matrix(
+        xyz: np.ndarray,
+        norm: np.ndarray,
+        area: np.ndarray,
+        threshold: float = 0.,
+        chunk_size: int = 2 ** 22,
+) -> CSRMatrix:
+    """Surface to surface view factor matrix of sampled surface patches, F[i, j] being the fraction of radiation
+    leaving patch i that arrives at patch j.
+
+    The pair kernel g = cos_i * cos_j / (pi * d^2) is symmetric, so it is computed for i < j only and reciprocity
+    A_i F_ij = A_j F_ji = g A_i A_j gives both entries. Patches not facing each other do not exchange and entries not
+    above `threshold` are dropped.
+
+    :param xyz:         [[x, y, z], ...], coordinates of surface patches, e.g. hot spots from `_sample_emitter`.
+    :param norm:        [[x, y, z], ...], normal vector of surface patches.
+    :param area:        [m2], area of surface patches.
+    :param threshold:   entries at or below this value are not stored.
+    :param chunk_size:  maximum number of patch pairs evaluated at once.
+    :return:            (n, n) view factor matrix.
+    """
+    xyz = np.asarray(xyz, dtype=np.float64)
+    norm = np.asarray(norm, dtype=np.float64)
+    norm = norm / np.linalg.norm(norm, axis=1)[:, np.newaxis]
+    area = np.asarray(area, dtype=np.float64)
+    n = len(xyz)
+
+    rows, cols, data = [], [], []
+
+    # blocks of rows i against columns j > i only, blocks take more rows as fewer columns remain
+    i = 0
+    while i < n - 1:
+        step = max(1, int(chunk_size) // (n - i - 1))
+        i_ = np.arange(i, min(i + step, n - 1))
+        j0 = i + 1
+        v = xyz[np.newaxis, j0:, :] - xyz[i_, np.newaxis, :]  # from patch i to patch j
+        d_square = np.einsum("ijk,ijk->ij", v, v)
+        cos_i = np.einsum("ijk,ik->ij", v, norm[i_])
+        cos_j = -np.einsum("ijk,jk->ij", v, norm[j0:])
+
+        upper = np.arange(j0, n)[np.newaxis, :] > i_[:, np.newaxis]
+        facing = upper & (cos_i > 0) & (cos_j > 0)
+        ii, jj = np.nonzero(facing)
+
+        g = cos_i[ii, jj] * cos_j[ii, jj] / (np.pi * d_square[ii, jj] ** 2)
+        ii, jj = i_[ii], jj + j0
+        i += len(i_)
+
+        f_ij, f_ji = g * area[jj], g * area[ii]
+        keep_ij, keep_ji = f_ij > threshold, f_ji > threshold
+        rows += [ii[keep_ij], jj[keep_ji]]
+        cols += [jj[keep_ij], ii[keep_ji]]
+        data += [f_ij[keep_ij], f_ji[keep_ji]]
+
+    rows = np.concatenate(rows) if rows else np.zeros((0,), dtype=int)
+    cols = np.concatenate(cols) if cols else np.zeros((0,), dtype=int)
+    data = np.concatenate(data) if data else np.zeros((0,), dtype=np.float64)
+
+    return CSRMatrix.from_coo(rows, cols, data, (n, n))
+
+
+def radiosity(
+        temperature: np.ndarray,
+        emissivity: Union[float, np.ndarray],
+        F: CSRMatrix,
+        tol: float = 1e-9,
+        iter_max: int = 1000,
+):
+    """Solves grey body radiation exchange between surface patches, for radiosity J:
+
+        J_i = e_i sigma T_i^4 + (1 - e_i) sum_j(F_ij J_j)
+
+    by Jacobi iterations on the sparse view factor matrix. These converge when (1 - e_i) sum_j(F_ij) < 1 for every
+    patch, which holds for exact view factors but sampled rows of F can sum to more than 1 in near field, a warning
+    is given when `tol` is not reached within `iter_max`.
+
+    :param temperature: [K] surface temperature of patches.
+    :param emissivity:  surface emissivity of patches, a single value or one per patch, greater than 0.
+    :param F:           view factor matrix, see `view_factor_matrix`.
+    :param tol:         convergence tolerance, maximum change of J relative to the maximum of J.
+    :param iter_max:    maximum number of iterations.
+    :return:            (J, H, q_net, n_iter), [W/m2] radiosity, incident irradiation and net heat flux leaving each
+                        patch (J - H) and the number of iterations.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    emissivity = np.broadcast_to(np.asarray(emissivity, dtype=np.float64), temperature.shape)
+
+    emitted = emissivity * 5.67e-8 * temperature ** 4
+    reflectivity = 1. - emissivity
+
+    J = emitted.copy()
+    H = F.dot(J)
+    n_iter = 0
+    while n_iter < iter_max:
+        J_ = emitted + reflectivity * H
+        n_iter += 1
+        converged = np.max(np.abs(J_ - J)) <= tol * max(np.max(np.abs(J_)), np.finfo(np.float64).tiny)
+        J = J_
+        H = F.dot(J)
+        if converged:
+            break
+    else:
+        warnings.warn(
+            f'Radiosity not converged in {iter_max} iterations, '
+            f'maximum view factor row sum {np.max(F.dot(np.ones(F.shape[1]))):.3f}.'
+        )
+
+    return J, H, J - H, n_iter
+
+
+def _test_view_factor_matrix():
+    # two facing 1 x 1 m plates 1 m apart, each 20 x 20 patches
+    arr = (np.arange(20) + 0.5) / 20
+    xy = np.asarray([(x, y) for x in arr for y in arr])
+    xyz = np.concatenate([np.c_[xy, np.zeros(len(xy))], np.c_[xy, np.ones(len(xy))]])
+    norm = np.concatenate([np.tile([0, 0, 1], (len(xy), 1)), np.tile([0, 0, -1], (len(xy), 1))])
+    area = np.full((len(xyz),), 1 / len(xy))
+
+    F = view_factor_matrix(xyz, norm, area)
+    F_ = F.toarray()
+
+    # reciprocity
+    assert np.allclose(area[:, np.newaxis] * F_, (area[:, np.newaxis] * F_).T)
+
+    # coplanar patches do not exchange, so only plate to plate pairs are stored
+    assert F.nnz == 2 * len(xy) ** 2
+
+    # plate to plate, 0.1998 for 1 x 1 m parallel plates 1 m apart
+    assert abs(np.sum(F_[0:len(xy), len(xy):] * area[0:len(xy), np.newaxis]) - 0.1998) < 2e-3
+
+    # chunked assembly gives the same matrix
+    assert np.allclose(view_factor_matrix(xyz, norm, area, chunk_size=100).toarray(), F_)
+    assert np.allclose(view_factor_matrix(xyz, norm, area, chunk_size=1).toarray(), F_)
+
+    # against all pairs computed directly
+    v = xyz[np.newaxis, :, :] - xyz[:, np.newaxis, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g = np.einsum("ijk,ik->ij", v, norm) * -np.einsum("ijk,jk->ij", v, norm) / (np.pi * np.sum(v * v, axis=2) ** 2)
+    g = np.where(np.isfinite(g) & (g > 0) & (np.einsum("ijk,ik->ij", v, norm) > 0), g, 0)
+    assert np.allclose(F_, g * area[np.newaxis, :])
+
+
+def _test_radiosity():
+    rng = np.random.RandomState(0)
+
+    # two facing 1 x 1 m plates 1 m apart
+    arr = (np.arange(10) + 0.5) / 10
+    xy = np.asarray([(x, y) for x in arr for y in arr])
+    xyz = np.concatenate([np.c_[xy, np.zeros(len(xy))], np.c_[xy, np.ones(len(xy))]])
+    norm = np.concatenate([np.tile([0, 0, 1], (len(xy), 1)), np.tile([0, 0, -1], (len(xy), 1))])
+    area = np.full((len(xyz),), 1 / len(xy))
+    F = view_factor_matrix(xyz, norm, area)
+
+    temperature = np.concatenate([np.full(len(xy), 1000.), np.full(len(xy), 293.15)])
+    emissivity = rng.uniform(0.3, 1, len(xyz))
+
+    # against a direct dense solve
+    J, H, q_net, n_iter = radiosity(temperature, emissivity, F)
+    J_expected = np.linalg.solve(
+        np.eye(len(xyz)) - (1 - emissivity)[:, np.newaxis] * F.toarray(),
+        emissivity * 5.67e-8 * temperature ** 4
+    )
+    assert np.allclose(J, J_expected, rtol=1e-7)
+    assert np.allclose(q_net, J - F.dot(J), rtol=1e-6)
+    assert n_iter < 1000
+
+    # black bodies, irradiation is the sum of view factor weighted emissive power
+    J, H, _, n_iter = radiosity(temperature, 1., F)
+    assert np.allclose(J, 5.67e-8 * temperature ** 4)
+    assert np.allclose(H, F.toarray() @ (5.67e-8 * temperature ** 4))
+    assert n_iter == 1
+
+    # not converged within iter_max
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        *_, n_iter = radiosity(temperature, 0.01, F, tol=1e-15, iter_max=2)
+    assert n_iter == 2 and len(w) == 1
+
+
+if __name__ == '__main__':
+    _test_view_factor_matrix()
+    _test_radiosity()
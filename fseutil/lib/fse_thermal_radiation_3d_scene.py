@@ -0,0 +1,420 @@
+from typing import Callable
+from typing import Union
+
+import numpy as np
+
+from fseutil.etc.geo import polygon_frame_3d
+from fseutil.etc.geo import triangulate_polygon
+from fseutil.lib.fse_thermal_radiation_3d import _receiver_kernel
+from fseutil.lib.fse_thermal_radiation_3d import _sample_emitter
+from fseutil.lib.fse_thermal_radiation_3d import phi_polygon_analytical
+
+
+def triangulate_polygons_3d(polygons: list) -> np.ndarray:
+    """Triangulates many planar 3D polygons, each is triangulated in its local 2D frame.
+
+    :param polygons:    a list of polygons, each in [[x1, y1, z1], [x2, y2, z2], ...]
+    :return:            (n, 3, 3) array of triangles, [[[x1, y1, z1], [x2, y2, z2], [x3, y3, z3]], ...]
+    """
+    polygons = [np.asarray(p, dtype=np.float64).reshape((-1, 3)) for p in polygons]
+    if len(polygons) == 0:
+        return np.zeros((0, 3, 3), dtype=np.float64)
+
+    _, _, origins, axes = polygon_frame_3d(polygons)
+
+    triangles = list()
+    for p, o, a in zip(polygons, origins, axes):
+        triangles.append(p[triangulate_polygon((p - o) @ a[0:2].T)])
+
+    return np.concatenate(triangles)
+
+
+def _segment_triangle_intersect(p0: np.ndarray, d: np.ndarray, triangles: np.ndarray, eps: float = 1e-9):
+    """Möller–Trumbore test of segments p0 + t * d, 0 < t < 1, against triangles, pairwise.
+
+    :param p0:          (n, 3) segment start points.
+    :param d:           (n, 3) segment vectors, from start to end points.
+    :param triangles:   (n, 3, 3) triangles.
+    :param eps:         segment ends within `eps` (fraction of the segment length) are not tested, so surfaces a
+                        segment starts or ends on do not block it.
+    :return:            (n,) boolean array, True where the segment crosses the triangle.
+    """
+    e1 = triangles[:, 1] - triangles[:, 0]
+    e2 = triangles[:, 2] - triangles[:, 0]
+    p = np.cross(d, e2)
+    det = np.einsum("ij,ij->i", e1, p)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        det_inv = 1. / det
+        s = p0 - triangles[:, 0]
+        u = np.einsum("ij,ij->i", s, p) * det_inv
+        q = np.cross(s, e1)
+        v = np.einsum("ij,ij->i", d, q) * det_inv
+        t = np.einsum("ij,ij->i", e2, q) * det_inv
+
+    return (det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > eps) & (t < 1 - eps)
+
+
+class BVH:
+    """Bounding volume hierarchy over triangles, for batched segment occlusion queries.
+
+    Nodes are axis aligned bounding boxes split at the median centroid along their longest axis. Queries walk the
+    tree breadth first for all segments at once, so each segment is only tested against the triangles in leaves its
+    path reaches, rather than every triangle.
+
+    :param triangles:   (n, 3, 3) array of triangles, see `triangulate_polygons_3d`.
+    :param leaf_size:   maximum number of triangles in a leaf node.
+    """
+
+    def __init__(self, triangles: np.ndarray, leaf_size: int = 4):
+        self.triangles = np.asarray(triangles, dtype=np.float64).reshape((-1, 3, 3))
+        n = len(self.triangles)
+
+        tri_min, tri_max = np.min(self.triangles, axis=1), np.max(self.triangles, axis=1)
+        centroids = np.mean(self.triangles, axis=1)
+
+        self.order = np.arange(n)
+        node_min, node_max, node_left, node_right, node_start, node_count = [], [], [], [], [], []
+
+        def new_node():
+            for l_ in (node_min, node_max):
+                l_.append(np.zeros((3,)))
+            for l_ in (node_left, node_right, node_start, node_count):
+                l_.append(0)
+            return len(node_min) - 1
+
+        stack = [(new_node(), 0, n)]
+        while stack:
+            node, start, end = stack.pop()
+            idx = self.order[start:end]
+            if len(idx) > 0:
+                node_min[node], node_max[node] = np.min(tri_min[idx], axis=0), np.max(tri_max[idx], axis=0)
+            else:
+                node_min[node], node_max[node] = np.full((3,), np.inf), np.full((3,), -np.inf)
+
+            c = centroids[idx]
+            extent = np.max(c, axis=0) - np.min(c, axis=0) if len(idx) > 0 else np.zeros((3,))
+            if end - start <= leaf_size or np.max(extent) <= 0:
+                node_start[node], node_count[node] = start, end - start
+                continue
+
+            axis = int(np.argmax(extent))
+            mid = (start + end) // 2
+            self.order[start:end] = idx[np.argpartition(c[:, axis], mid - start)]
+
+            node_left[node], node_right[node] = new_node(), new_node()
+            stack.append((node_left[node], start, mid))
+            stack.append((node_right[node], mid, end))
+
+        self.node_min, self.node_max = np.asarray(node_min), np.asarray(node_max)
+        self.node_left, self.node_right = np.asarray(node_left, dtype=int), np.asarray(node_right, dtype=int)
+        self.node_start, self.node_count = np.asarray(node_start, dtype=int), np.asarray(node_count, dtype=int)
+
+    def occluded(self, p0: np.ndarray, p1: np.ndarray, chunk_size: int = 2 ** 18) -> np.ndarray:
+        """Tests whether segments from `p0` to `p1` are blocked by any triangle.
+
+        :param p0:          (n, 3) segment start points.
+        :param p1:          (n, 3) segment end points.
+        :param chunk_size:  number of segments traversed at once.
+        :return:            (n,) boolean array, True where the segment is blocked.
+        """
+        p0 = np.asarray(p0, dtype=np.float64).reshape((-1, 3))
+        p1 = np.asarray(p1, dtype=np.float64).reshape((-1, 3))
+
+        hit = np.full((len(p0),), False)
+        if len(self.triangles) == 0:
+            return hit
+
+        for i in range(0, len(p0), chunk_size):
+            hit[i:i + chunk_size] = self._occluded(p0[i:i + chunk_size], p1[i:i + chunk_size])
+
+        return hit
+
+    def _occluded(self, p0: np.ndarray, p1: np.ndarray) -> np.ndarray:
+        d = p1 - p0
+        with np.errstate(divide="ignore"):
+            d_inv = 1. / d
+
+        hit = np.full((len(p0),), False)
+
+        # frontier of (segment, node) pairs still to be visited
+        ray, node = np.arange(len(p0)), np.zeros((len(p0),), dtype=int)
+        while len(ray) > 0:
+            # slab test, segment parameter within [0, 1], NaN from 0 * inf are ignored by fmin/fmax
+            with np.errstate(invalid="ignore"):
+                t1 = (self.node_min[node] - p0[ray]) * d_inv[ray]
+                t2 = (self.node_max[node] - p0[ray]) * d_inv[ray]
+            t_min = np.max(np.fmin(t1, t2), axis=1)
+            t_max = np.min(np.fmax(t1, t2), axis=1)
+            keep = (t_max >= np.maximum(t_min, 0)) & (t_min <= 1) & ~hit[ray]
+            ray, node = ray[keep], node[keep]
+
+            # leaves, test against their triangles
+            leaf = self.node_count[node] > 0
+            ray_, node_ = ray[leaf], node[leaf]
+            n_ = self.node_count[node_]
+            ray_ = np.repeat(ray_, n_)
+            i_tri = self.order[np.repeat(self.node_start[node_], n_) + np.arange(np.sum(n_)) - np.repeat(np.cumsum(n_) - n_, n_)]
+            hit[ray_[_segment_triangle_intersect(p0[ray_], d[ray_], self.triangles[i_tri])]] = True
+
+            # internal nodes, visit their children
+            ray, node = ray[~leaf], node[~leaf]
+            ray, node = np.concatenate([ray, ray]), np.concatenate([self.node_left[node], self.node_right[node]])
+            keep = ~hit[ray]
+            ray, node = ray[keep], node[keep]
+
+        return hit
+
+
+def _test_bvh():
+    rng = np.random.RandomState(0)
+
+    # a cloud of small triangles
+    triangles = rng.uniform(0, 10, (500, 1, 3)) + rng.uniform(-1, 1, (500, 3, 3))
+    p0, p1 = rng.uniform(-1, 11, (2000, 3)), rng.uniform(-1, 11, (2000, 3))
+
+    # against brute force
+    hit_expected = np.full((len(p0),), False)
+    for tri in triangles:
+        hit_expected |= _segment_triangle_intersect(p0, p1 - p0, np.broadcast_to(tri, (len(p0), 3, 3)))
+
+    for leaf_size, chunk_size in [(4, 2 ** 18), (1, 7), (1000, 2 ** 18)]:
+        assert np.all(BVH(triangles, leaf_size=leaf_size).occluded(p0, p1, chunk_size=chunk_size) == hit_expected)
+
+    # no triangles
+    assert not np.any(BVH(np.zeros((0, 3, 3))).occluded(p0, p1))
+
+
+class Scene:
+    """Multi emitter scene with obstructions, to calculate heat flux at receivers.
+
+    Each emitter is discretised into hot spots as in `single_receiver`, rays from hot spots to receivers are tested
+    for occlusion against all obstruction polygons through a BVH before their contributions are summed. Unlike
+    `single_receiver`, a hot spot only contributes when the emitter and the receiver face each other.
+    """
+
+    def __init__(self):
+        self.emitters = list()
+        self.obstructions = list()
+        self._bvh = None
+        self._hot_spots = dict()
+
+    def add_emitter(self, vertices: np.ndarray, norm: np.ndarray, temperature: Union[float, Callable]):
+        """
+        :param vertices: vertices defining an emitter polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+        :param norm: a vector definiting the facing direction of the emitter polygon, in [x, y, z]
+        :param temperature: [K] emitter surface temperature, a single value or a callable of hot spot coordinates, see
+            `_sample_emitter`.
+        """
+        self.emitters.append((np.asarray(vertices, dtype=np.float64), np.asarray(norm, dtype=np.float64), temperature))
+        self._hot_spots.clear()
+
+    def add_obstruction(self, vertices: np.ndarray):
+        """
+        :param vertices: vertices defining an obstruction polygon, in [[x1, y1, z1], [x2, y2, z2], ...]
+        """
+        self.obstructions.append(np.asarray(vertices, dtype=np.float64))
+        self._bvh = None
+
+    @property
+    def bvh(self) -> BVH:
+        if self._bvh is None:
+            self._bvh = BVH(triangulate_polygons_3d(self.obstructions))
+        return self._bvh
+
+    def hot_spots(self, n_points: int = 1000, sampling: str = 'triangle') -> list:
+        """Hot spots of each emitter, see `_sample_emitter`. Sampled once and reused until an emitter is added.
+
+        :param n_points: number of hot spots to be casted onto each emitter polygon.
+        :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+        :return: a list of (xyz, unit norm, T^4, area) of each emitter.
+        """
+        key = (n_points, sampling)
+        if key not in self._hot_spots:
+            hot_spots = list()
+            for ep_vertices, ep_norm, ep_temperature in self.emitters:
+                ep_xyz, _, ep_xyz_temperature, ep_xyz_area = _sample_emitter(
+                    ep_vertices=ep_vertices, ep_norm=ep_norm, ep_temperature=ep_temperature, n_points=n_points,
+                    sampling=sampling
+                )
+                hot_spots.append((ep_xyz, ep_norm / np.linalg.norm(ep_norm), ep_xyz_temperature ** 4, ep_xyz_area))
+            self._hot_spots[key] = hot_spots
+        return self._hot_spots[key]
+
+    def receivers(
+            self,
+            rp_vertices: np.ndarray,
+            rp_norm: np.ndarray,
+            rp_temperature: Union[float, np.ndarray],
+            n_points: int = 1000,
+            sampling: str = 'triangle',
+            chunk_size: int = 2 ** 20,
+    ):
+        """Calculates resultant heat flux at receivers from all emitters in the scene.
+
+        :param rp_vertices: receiver locations, in [[x1, y1, z1], [x2, y2, z2], ...]
+        :param rp_norm: receiver facing directions, either a single [x, y, z] shared by all receivers or one per receiver.
+        :param rp_temperature: [K] receiver surface temperature, either a single value or one per receiver.
+        :param n_points: number of hot spots to be casted onto each emitter polygon.
+        :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+        :param chunk_size: maximum number of hot spot-receiver rays evaluated at once.
+        :return: (heat_flux, phi), [W/m2] resultant heat flux and view factor arrays in shape (N,).
+        """
+
+        rp_xyz = np.reshape(np.asarray(rp_vertices, dtype=np.float64), (-1, 3))
+        n_receivers = len(rp_xyz)
+        rp_xyz_norm = np.broadcast_to(np.asarray(rp_norm, dtype=np.float64), (n_receivers, 3))
+        rp_xyz_norm = rp_xyz_norm / np.linalg.norm(rp_xyz_norm, axis=1)[:, np.newaxis]
+        rp_xyz_t4 = np.broadcast_to(np.asarray(rp_temperature, dtype=np.float64), (n_receivers,)) ** 4
+
+        heat_flux = np.zeros((n_receivers,), dtype=np.float64)
+        phi_ = np.zeros((n_receivers,), dtype=np.float64)
+
+        for ep_xyz, ep_norm_u, ep_xyz_t4, ep_xyz_area in self.hot_spots(n_points=n_points, sampling=sampling):
+            # only mutually facing and unobstructed pairs are counted
+            p, p_t4 = _receiver_kernel(
+                ep_xyz=ep_xyz, ep_norm=np.broadcast_to(ep_norm_u, ep_xyz.shape), ep_t4=ep_xyz_t4, ep_area=ep_xyz_area,
+                rp_xyz=rp_xyz, rp_norm=rp_xyz_norm, chunk_size=chunk_size,
+                occluded=lambda i_e, i_r: self.bvh.occluded(ep_xyz[i_e], rp_xyz[i_r]),
+            )
+            phi_ += p
+            heat_flux += 5.67e-8 * 1.0 * (p_t4 - rp_xyz_t4 * p)
+
+        return heat_flux, phi_
+
+    def critical_separation(
+            self,
+            origins: np.ndarray,
+            direction: np.ndarray,
+            heat_flux_critical: float = 12.6e3,
+            rp_temperature: float = 293.15,
+            s_min: float = 1.,
+            s_max: float = 100.,
+            tol: float = 1e-3,
+            n_points: int = 1000,
+            sampling: str = 'triangle',
+            chunk_size: int = 2 ** 20,
+    ):
+        """Solves the separation along receiver lines at which heat flux drops to `heat_flux_critical`.
+
+        Receivers on line i are at origins[i] + s * direction and face back along -direction, i.e. a receiver plane
+        perpendicular to `direction` moved away from the emitters. Heat flux is assumed to decrease with s. All lines are
+        bisected at once, each iteration evaluates the unconverged lines in one `receivers` call and the emitter hot
+        spots and obstruction BVH are reused throughout. The solved points, in line order, are the `heat_flux_critical`
+        isocontour as a polyline.
+
+        :param origins: [[x, y, z], ...], start points of receiver lines, from which separation is measured.
+        :param direction: [x, y, z], direction of all receiver lines, away from the emitters.
+        :param heat_flux_critical: [W/m2] critical heat flux.
+        :param rp_temperature: [K] receiver surface temperature.
+        :param s_min: [m] lower bound of separation, to be well above the hot spots spacing as sampled heat flux is not
+            accurate closer to the emitters.
+        :param s_max: [m] upper bound of separation.
+        :param tol: [m] separation tolerance.
+        :param n_points: number of hot spots to be casted onto each emitter polygon.
+        :param sampling: hot spots sampling method, see `scatter_in_polygon_2d`.
+        :param chunk_size: maximum number of hot spot-receiver rays evaluated at once.
+        :return: (separation, polyline), [m] separation of each line, the conservative end of the final bracket, `s_min`
+            where heat flux is already below `heat_flux_critical` at `s_min` and NaN where still above at `s_max`; and
+            [[x, y, z], ...] points at the separations.
+        """
+        origins = np.reshape(np.asarray(origins, dtype=np.float64), (-1, 3))
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / np.linalg.norm(direction)
+        n = len(origins)
+
+        def heat_flux(s_: np.ndarray, i_: np.ndarray) -> np.ndarray:
+            return self.receivers(
+                origins[i_] + s_[:, np.newaxis] * direction, -direction, rp_temperature, n_points=n_points,
+                sampling=sampling, chunk_size=chunk_size
+            )[0]
+
+        lower, upper = np.full((n,), float(s_min)), np.full((n,), float(s_max))
+        q_lower, q_upper = np.split(heat_flux(np.concatenate([lower, upper]), np.tile(np.arange(n), 2)), 2)
+        bracketed = (q_lower > heat_flux_critical) & (q_upper <= heat_flux_critical)
+
+        active = np.nonzero(bracketed)[0]
+        while len(active) > 0:
+            mid = (lower[active] + upper[active]) / 2
+            above = heat_flux(mid, active) > heat_flux_critical
+            lower[active[above]] = mid[above]
+            upper[active[~above]] = mid[~above]
+            active = active[upper[active] - lower[active] > tol]
+
+        separation = np.full((n,), np.nan)
+        separation[q_lower <= heat_flux_critical] = s_min
+        separation[bracketed] = upper[bracketed]
+
+        return separation, origins + separation[:, np.newaxis] * direction
+
+
+def _test_critical_separation():
+    # 5 x 5 m emitter at 100 kW/m2 in plane x = 0, receiver lines along +x
+    ep = np.asarray([[0, 0, 0], [0, 5, 0], [0, 5, 5], [0, 0, 5]], dtype=np.float64)
+    scene = Scene()
+    scene.add_emitter(ep, [1, 0, 0], 1153.)
+
+    origins = np.asarray([[0, y, 2.5] for y in np.linspace(-5, 10, 16)] + [[0, 100, 2.5]])
+    separation, polyline = scene.critical_separation(origins, [1, 0, 0], n_points=2000, tol=1e-3)
+
+    assert np.allclose(polyline, origins + separation[:, np.newaxis] * [1, 0, 0])
+    assert separation[-1] == 1.  # far to the side, already below at s_min
+
+    # heat flux at the solved points, against the exact view factor
+    solved = separation > 1.
+    p = phi_polygon_analytical(ep, [1, 0, 0], polyline[solved], [-1, 0, 0])
+    assert np.allclose(5.67e-8 * (1153. ** 4 - 293.15 ** 4) * p, 12.6e3, rtol=2e-2)
+
+    # symmetric about the emitter centre line and largest at it
+    assert np.allclose(separation[:16], separation[:16][::-1], atol=2e-2)
+    assert np.argmax(separation[:16]) in (7, 8)
+
+    # not bracketed
+    separation, polyline = scene.critical_separation(origins[7:8], [1, 0, 0], s_max=1.)
+    assert np.isnan(separation[0]) and np.all(np.isnan(polyline))
+
+
+def _test_scene():
+    ep = np.asarray([[0, 0, 5], [0, 5, 5], [5, 5, 5], [5, 0, 5]], dtype=np.float64)
+    rp = np.asarray([[2.5, 2.5, 0], [1, 1, 0], [4, 2, 1]], dtype=np.float64)
+
+    # unobstructed, against the exact view factor
+    scene = Scene()
+    scene.add_emitter(ep, [0, 0, -1], 1153.)
+    q, p = scene.receivers(rp, [0, 0, 1], 293.15, n_points=5000)
+    p_expected = phi_polygon_analytical(ep, [0, 0, -1], rp, [0, 0, 1])
+    assert np.allclose(p, p_expected, rtol=1e-2)
+    assert np.allclose(q, 5.67e-8 * (1153. ** 4 - 293.15 ** 4) * p)
+
+    # two emitters sum up
+    scene.add_emitter(ep + [0, 0, 5], [0, 0, -1], 1153.)
+    q_2, p_2 = scene.receivers(rp, [0, 0, 1], 293.15, n_points=5000)
+    p_expected += phi_polygon_analytical(ep + [0, 0, 5], [0, 0, -1], rp, [0, 0, 1])
+    assert np.allclose(p_2, p_expected, rtol=1e-2)
+
+    # the lower emitter shades the upper one when also added as an obstruction, a full size plate in between blocks all
+    scene.add_obstruction(ep)
+    _, p_3 = scene.receivers(rp, [0, 0, 1], 293.15, n_points=5000)
+    assert np.allclose(p_3, p, rtol=1e-9)
+    scene.add_obstruction(ep - [10, 10, 3] + [[0, 0, 0], [0, 20, 0], [20, 20, 0], [20, 0, 0]])
+    _, p_4 = scene.receivers(rp, [0, 0, 1], 293.15, n_points=5000)
+    assert np.allclose(p_4, 0)
+
+    # half of the emitter shaded by a plate in between, receiver right below the shaded half sees the open half only
+    scene = Scene()
+    scene.add_emitter(ep, [0, 0, -1], 1153.)
+    scene.add_obstruction([[-10, -10, 4.99], [2.5, -10, 4.99], [2.5, 15, 4.99], [-10, 15, 4.99]])
+    _, p = scene.receivers([[1, 2.5, 0]], [0, 0, 1], 293.15, n_points=5000)
+    ep_open = np.asarray([[2.5, 0, 5], [2.5, 5, 5], [5, 5, 5], [5, 0, 5]], dtype=np.float64)
+    p_expected = phi_polygon_analytical(ep_open, [0, 0, -1], [1, 2.5, 0], [0, 0, 1])
+    assert np.allclose(p, p_expected, rtol=2e-2)
+
+    # blocks smaller than one receiver row give the same result
+    _, p_ = scene.receivers([[1, 2.5, 0]], [0, 0, 1], 293.15, n_points=5000, chunk_size=999)
+    assert np.allclose(p_, p, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    _test_bvh()
+    _test_critical_separation()
+    _test_scene()
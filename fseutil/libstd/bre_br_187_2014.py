@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 def eq_A4_phi_parallel_corner(W_m, H_m, S_m, multiplier=1):
     """Equation A4 in BR 187 second edition (2014) calculates view factor from a rectangle corner parallel.
@@ -44,3 +46,191 @@ def eq_A5_phi_perpendicular_corner(W_m, H_m, S_m, multiplier=1):
     phi = a * (b - c * d)
 
     return phi * multiplier
+
+
+def eq_A4_dphi_dS_parallel_corner(W_m, H_m, S_m, multiplier=1):
+    """Derivative of equation A4 `eq_A4_phi_parallel_corner` with respect to separation distance S_m.
+
+    With X = W/S and Y = H/S, dphi/dS = -(X dphi/dX + Y dphi/dY) / S.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param S_m: in m, separation distance from surface to surface
+    :param multiplier:
+    :return dphi_dS: in 1/m, derivative of configuration factor
+    """
+    X = W_m / S_m
+    Y = H_m / S_m
+    a = 1 / 2 / math.pi
+    A = (1 + X ** 2) ** 0.5
+    B = (1 + Y ** 2) ** 0.5
+    R = 1 + X ** 2 + Y ** 2
+    b = X * math.atan(Y / A) / A ** 3
+    c = Y * math.atan(X / B) / B ** 3
+    d = X * Y / R * (1 / A ** 2 + 1 / B ** 2)
+    dphi_dS = -a * (b + c + d) / S_m
+
+    return dphi_dS * multiplier
+
+
+def eq_A5_dphi_dS_perpendicular_corner(W_m, H_m, S_m, multiplier=1):
+    """Derivative of equation A5 `eq_A5_phi_perpendicular_corner` with respect to separation distance S_m.
+
+    With X = W/S and Y = H/S, dphi/dS = -(X dphi/dX + Y dphi/dY) / S.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param S_m: in m, separation distance from surface to surface
+    :param multiplier:
+    :return dphi_dS: in 1/m, derivative of configuration factor
+    """
+    X = W_m / S_m
+    Y = H_m / S_m
+    a = 1 / 2 / math.pi
+    B = (1 + Y ** 2) ** 0.5
+    R = 1 + X ** 2 + Y ** 2
+    b = X / (1 + X ** 2)
+    c = X / (B ** 2 * R)
+    d = Y ** 2 * math.atan(X / B) / B ** 3
+    dphi_dS = -a * (b - c + d) / S_m
+
+    return dphi_dS * multiplier
+
+
+def eq_A4_phi_parallel_corner_array(W_m, H_m, S_m, multiplier=1):
+    """Same as `eq_A4_phi_parallel_corner`, but W_m, H_m, S_m and multiplier can be arrays and are broadcast together.
+
+    Scalar input is evaluated by `eq_A4_phi_parallel_corner`, so results are bit-compatible with it, negative S_m
+    included. X and Y are capped at +/-1e150 so their squares do not overflow. At S_m = 0, and only there, the corner
+    rectangle fills a quarter of the receiver's view, phi = 1/4, or 0 if W_m or H_m is 0.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param S_m: in m, separation distance from surface to surface
+    :param multiplier:
+    :return phi: configuration factor, a float for scalar input or an array in the broadcast shape
+    """
+    W_m, H_m, S_m, multiplier = np.broadcast_arrays(
+        *[np.asarray(i, dtype=np.float64) for i in (W_m, H_m, S_m, multiplier)]
+    )
+    if W_m.ndim == 0 and S_m != 0 and max(abs(W_m), abs(H_m)) < 1e150 * abs(S_m):
+        return eq_A4_phi_parallel_corner(float(W_m), float(H_m), float(S_m), float(multiplier))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        X = np.clip(W_m / S_m, -1e150, 1e150)
+        Y = np.clip(H_m / S_m, -1e150, 1e150)
+        a = 1 / 2 / np.pi
+        X_ = np.sqrt(1 + X * X)
+        Y_ = np.sqrt(1 + Y * Y)
+        b = X / X_
+        c = np.arctan(Y / X_)
+        d = Y / Y_
+        e = np.arctan(X / Y_)
+        phi = a * (b * c + d * e)
+
+    phi = np.where(S_m != 0, phi, np.where((W_m > 0) & (H_m > 0), 0.25, 0.))
+
+    return phi * multiplier
+
+
+def eq_A5_phi_perpendicular_corner_array(W_m, H_m, S_m, multiplier=1):
+    """Same as `eq_A5_phi_perpendicular_corner`, but W_m, H_m, S_m and multiplier can be arrays and are broadcast
+    together.
+
+    Scalar input is evaluated by `eq_A5_phi_perpendicular_corner`, so results are bit-compatible with it, negative
+    S_m included. Y is capped at +/-1e150 so its square does not overflow. At S_m = 0, and only there, the corner
+    rectangle fills a quarter of the receiver's view, phi = 1/4, or 0 if W_m or H_m is 0.
+
+    :param W_m: in m, width of emitter panel
+    :param H_m: in m, height of emitter panel
+    :param S_m: in m, separation distance from surface to surface
+    :param multiplier:
+    :return phi: configuration factor, a float for scalar input or an array in the broadcast shape
+    """
+    W_m, H_m, S_m, multiplier = np.broadcast_arrays(
+        *[np.asarray(i, dtype=np.float64) for i in (W_m, H_m, S_m, multiplier)]
+    )
+    if W_m.ndim == 0 and S_m != 0 and max(abs(W_m), abs(H_m)) < 1e150 * abs(S_m):
+        return eq_A5_phi_perpendicular_corner(float(W_m), float(H_m), float(S_m), float(multiplier))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        X = W_m / S_m
+        Y = np.clip(H_m / S_m, -1e150, 1e150)
+        a = 1 / 2 / np.pi
+        Y_ = np.sqrt(1 + Y * Y)
+        b = np.arctan(X)
+        c = 1 / Y_
+        d = np.arctan(X / Y_)
+        phi = a * (b - c * d)
+
+    phi = np.where(S_m != 0, phi, np.where((W_m > 0) & (H_m > 0), 0.25, 0.))
+
+    return phi * multiplier
+
+
+def _test_eq_A4_phi_parallel_corner_array():
+    rng = np.random.RandomState(0)
+    W, H, S = rng.uniform(0, 50, (3, 1000))
+
+    # scalar input, bit-compatible
+    assert all(eq_A4_phi_parallel_corner_array(*i) == eq_A4_phi_parallel_corner(*i) for i in zip(W, H, S))
+    assert eq_A4_phi_parallel_corner_array(10, 10, 10) == eq_A4_phi_parallel_corner(10, 10, 10)
+
+    # array input, broadcast
+    phi = eq_A4_phi_parallel_corner_array(W, H, S, 2)
+    assert np.allclose(phi, [eq_A4_phi_parallel_corner(*i, 2) for i in zip(W, H, S)], rtol=1e-13, atol=0)
+    assert eq_A4_phi_parallel_corner_array(W[:, np.newaxis], H, 10).shape == (1000, 1000)
+
+    # negative separation, same as the scalar equation, the S_m -> 0 limit applies at S_m = 0 only
+    assert all(eq_A4_phi_parallel_corner_array(*i) == eq_A4_phi_parallel_corner(*i) for i in zip(W, H, -S))
+    phi = eq_A4_phi_parallel_corner_array(W, H, -S)
+    assert np.allclose(phi, [eq_A4_phi_parallel_corner(*i) for i in zip(W, H, -S)], rtol=1e-13, atol=0)
+
+    # S -> 0, X or Y -> 0
+    phi = eq_A4_phi_parallel_corner_array(
+        [10, 10, 0, 10, 10, 10, 0], [10, 10, 10, 0, 10, 1e-300, 0], [0, 1e-300, 0, 0, 1e300, 1, 1]
+    )
+    assert np.allclose(phi, [0.25, 0.25, 0, 0, 0, 0, 0])
+
+
+def _test_eq_A5_phi_perpendicular_corner_array():
+    rng = np.random.RandomState(0)
+    W, H, S = rng.uniform(0, 50, (3, 1000))
+
+    # scalar input, bit-compatible
+    assert all(eq_A5_phi_perpendicular_corner_array(*i) == eq_A5_phi_perpendicular_corner(*i) for i in zip(W, H, S))
+    assert eq_A5_phi_perpendicular_corner_array(10, 10, 10) == eq_A5_phi_perpendicular_corner(10, 10, 10)
+
+    # array input, broadcast
+    phi = eq_A5_phi_perpendicular_corner_array(W, H, S, 2)
+    assert np.allclose(phi, [eq_A5_phi_perpendicular_corner(*i, 2) for i in zip(W, H, S)], rtol=0, atol=1e-15)
+    assert eq_A5_phi_perpendicular_corner_array(W[:, np.newaxis], H, 10).shape == (1000, 1000)
+
+    # negative separation, same as the scalar equation, the S_m -> 0 limit applies at S_m = 0 only
+    assert all(eq_A5_phi_perpendicular_corner_array(*i) == eq_A5_phi_perpendicular_corner(*i) for i in zip(W, H, -S))
+    phi = eq_A5_phi_perpendicular_corner_array(W, H, -S)
+    assert np.allclose(phi, [eq_A5_phi_perpendicular_corner(*i) for i in zip(W, H, -S)], rtol=0, atol=1e-15)
+
+    # S -> 0, X or Y -> 0
+    phi = eq_A5_phi_perpendicular_corner_array(
+        [10, 10, 0, 10, 10, 10, 1e-300], [10, 10, 10, 0, 10, 1e300, 10], [0, 1e-300, 0, 0, 1e300, 1, 1]
+    )
+    assert np.allclose(phi, [0.25, 0.25, 0, 0, 0, np.arctan(10) / 2 / np.pi, 0], atol=1e-12)
+
+
+def _test_eq_dphi_dS_corner():
+    rng = np.random.RandomState(0)
+    W, H = rng.uniform(0.1, 50, (2, 200))
+    S = rng.uniform(0.1, 100, 200)
+
+    # against central difference of the view factor equations
+    for eq, eq_dphi_dS in [
+        (eq_A4_phi_parallel_corner, eq_A4_dphi_dS_parallel_corner),
+        (eq_A5_phi_perpendicular_corner, eq_A5_dphi_dS_perpendicular_corner),
+    ]:
+        for W_, H_, S_ in zip(W, H, S):
+            dS = 1e-5 * S_
+            dphi_dS = (eq(W_, H_, S_ + dS) - eq(W_, H_, S_ - dS)) / (2 * dS)
+            assert abs(eq_dphi_dS(W_, H_, S_) - dphi_dS) < 1e-6 * abs(dphi_dS) + 1e-12
+            assert eq_dphi_dS(W_, H_, S_, -1) == -eq_dphi_dS(W_, H_, S_)
+            assert eq_dphi_dS(W_, H_, S_) < 0
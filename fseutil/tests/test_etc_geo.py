@@ -0,0 +1,13 @@
+from fseutil.etc.geo import _test_find_all_segment_intersections as test_find_all_segment_intersections
+from fseutil.etc.geo import _test_find_line_segment_intersection_batch as test_find_line_segment_intersection_batch
+from fseutil.etc.geo import _test_points_in_ploy as test_points_in_ploy
+from fseutil.etc.geo import _test_polygon_frame_3d as test_polygon_frame_3d
+from fseutil.etc.geo import _test_polygon_index as test_polygon_index
+from fseutil.etc.geo import _test_triangulate_polygon as test_triangulate_polygon
+
+test_find_all_segment_intersections()
+test_find_line_segment_intersection_batch()
+test_points_in_ploy()
+test_polygon_frame_3d()
+test_polygon_index()
+test_triangulate_polygon()
@@ -1,5 +1,15 @@
+from fseutil.lib.fse_thermal_radiation import _test_four_planes_array as test_four_planes_array
+from fseutil.lib.fse_thermal_radiation import _test_linear_solver_batch as test_linear_solver_batch
+from fseutil.lib.fse_thermal_radiation import _test_newton_solver as test_newton_solver
+from fseutil.lib.fse_thermal_radiation import _test_phi_any_br187_array as test_phi_any_br187_array
+from fseutil.lib.fse_thermal_radiation import _test_phi_map_br187 as test_phi_map_br187
 from fseutil.lib.fse_thermal_radiation import _test_phi_parallel_any_br187 as test_phi_parallel_any_br187
 from fseutil.lib.fse_thermal_radiation import _test_phi_perpendicular_any_br187 as test_phi_perpendicular_any_br187
 
+test_four_planes_array()
+test_linear_solver_batch()
+test_newton_solver()
+test_phi_any_br187_array()
+test_phi_map_br187()
 test_phi_parallel_any_br187()
 test_phi_perpendicular_any_br187()
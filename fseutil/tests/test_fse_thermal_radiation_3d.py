@@ -0,0 +1,39 @@
+from fseutil.lib.fse_thermal_radiation_3d import _test_angle_between as test_angle_between
+from fseutil.lib.fse_thermal_radiation_3d import _test_escape_route_exposure as test_escape_route_exposure
+from fseutil.lib.fse_thermal_radiation_3d import _test_gridded_temperature_field as test_gridded_temperature_field
+from fseutil.lib.fse_thermal_radiation_3d import _test_phi_against_angle_between as test_phi_against_angle_between
+from fseutil.lib.fse_thermal_radiation_3d import _test_phi_parallel as test_phi_parallel
+from fseutil.lib.fse_thermal_radiation_3d import _test_phi_perpendicular as test_phi_perpendicular
+from fseutil.lib.fse_thermal_radiation_3d import _test_phi_polygon_analytical as test_phi_polygon_analytical
+from fseutil.lib.fse_thermal_radiation_3d import _test_poly_area_2d as test_poly_area_2d
+from fseutil.lib.fse_thermal_radiation_3d import _test_poly_area_3d as test_poly_area_3d
+from fseutil.lib.fse_thermal_radiation_3d import _test_receiver_grid as test_receiver_grid
+from fseutil.lib.fse_thermal_radiation_3d import _test_receiver_kernel as test_receiver_kernel
+from fseutil.lib.fse_thermal_radiation_3d import _test_receiver_panel as test_receiver_panel
+from fseutil.lib.fse_thermal_radiation_3d import _test_sampling_accuracy as test_sampling_accuracy
+from fseutil.lib.fse_thermal_radiation_3d import _test_scatter_in_polygon_2d as test_scatter_in_polygon_2d
+from fseutil.lib.fse_thermal_radiation_3d import _test_scatter_in_polygon_3d as test_scatter_in_polygon_3d
+from fseutil.lib.fse_thermal_radiation_3d import _test_single_receiver_adaptive as test_single_receiver_adaptive
+from fseutil.lib.fse_thermal_radiation_3d import _test_single_receiver_temperature_field as test_single_receiver_temperature_field
+from fseutil.lib.fse_thermal_radiation_3d import _test_thermal_radiation_dose as test_thermal_radiation_dose
+from fseutil.lib.fse_thermal_radiation_3d import _test_view_factor_cache as test_view_factor_cache
+
+test_angle_between()
+test_escape_route_exposure()
+test_gridded_temperature_field()
+test_phi_against_angle_between()
+test_phi_parallel()
+test_phi_perpendicular()
+test_phi_polygon_analytical()
+test_poly_area_2d()
+test_poly_area_3d()
+test_receiver_grid()
+test_receiver_kernel()
+test_receiver_panel()
+test_sampling_accuracy()
+test_scatter_in_polygon_2d()
+test_scatter_in_polygon_3d()
+test_single_receiver_adaptive()
+test_single_receiver_temperature_field()
+test_thermal_radiation_dose()
+test_view_factor_cache()
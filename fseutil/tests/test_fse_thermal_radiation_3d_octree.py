@@ -0,0 +1,3 @@
+from fseutil.lib.fse_thermal_radiation_3d_octree import _test_emitter_octree as test_emitter_octree
+
+test_emitter_octree()
@@ -0,0 +1,5 @@
+from fseutil.lib.fse_thermal_radiation_3d_radiosity import _test_radiosity as test_radiosity
+from fseutil.lib.fse_thermal_radiation_3d_radiosity import _test_view_factor_matrix as test_view_factor_matrix
+
+test_radiosity()
+test_view_factor_matrix()
@@ -0,0 +1,7 @@
+from fseutil.lib.fse_thermal_radiation_3d_scene import _test_bvh as test_bvh
+from fseutil.lib.fse_thermal_radiation_3d_scene import _test_critical_separation as test_critical_separation
+from fseutil.lib.fse_thermal_radiation_3d_scene import _test_scene as test_scene
+
+test_bvh()
+test_critical_separation()
+test_scene()
@@ -0,0 +1,7 @@
+from fseutil.libstd.bre_br_187_2014 import _test_eq_A4_phi_parallel_corner_array as test_eq_A4_phi_parallel_corner_array
+from fseutil.libstd.bre_br_187_2014 import _test_eq_A5_phi_perpendicular_corner_array as test_eq_A5_phi_perpendicular_corner_array
+from fseutil.libstd.bre_br_187_2014 import _test_eq_dphi_dS_corner as test_eq_dphi_dS_corner
+
+test_eq_A4_phi_parallel_corner_array()
+test_eq_A5_phi_perpendicular_corner_array()
+test_eq_dphi_dS_corner()